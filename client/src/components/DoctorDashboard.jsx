@@ -23,12 +23,24 @@ import Drawer from '@mui/material/Drawer';
 
 const drawerWidth = 250;
 
+// List endpoints return one page at a time; the cursor for the next page,
+// if there is one, comes back in this header (axios lowercases names)
+const NEXT_CURSOR_HEADER = 'x-next-cursor';
+
+const fetchPage = async (url, headers, cursor) => {
+  const res = await axios.get(url, { headers, params: cursor ? { cursor } : {} });
+  return { rows: res.data || [], next: res.headers[NEXT_CURSOR_HEADER] || null };
+};
+
 function DoctorDashboard() {
   const [todayAppointments, setTodayAppointments] = useState([]);
   const [futureAppointments, setFutureAppointments] = useState([]);
   const [pendingCount, setPendingCount] = useState(0);
   const [doctorProfile, setDoctorProfile] = useState(null);
   const [pastAppointments, setPastAppointments] = useState([]);
+  const [todayCursor, setTodayCursor] = useState(null);
+  const [pastCursor, setPastCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(null);
   const { user } = useAuth();
   const navigate = useNavigate();
   const [loading, setLoading] = useState(true);
@@ -38,18 +50,20 @@ function DoctorDashboard() {
       if (!user?.user_id) return;
       try {
         const [todayRes, futureRes, pendingRes, profileRes, pastRes] = await Promise.all([
-          axios.get('/today-visits', { headers: { 'Authorization-Id': user.user_id } }),
-          axios.get('/future-visits', { headers: { 'Authorization-Id': user.user_id } }),
+          fetchPage('/today-visits', { 'Authorization-Id': user.user_id }),
+          axios.get('/future-visits?limit=5', { headers: { 'Authorization-Id': user.user_id } }),
           axios.get('/pending-questions-for-doctor', { headers: { Authorization: user.user_id } }),
           axios.get('/doctor-profile', { headers: { Authorization: user.user_id } }),
-          axios.get('/past-visits', { headers: {'Authorization': user.user_id} })
+          fetchPage('/past-visits', { Authorization: user.user_id })
         ]);
 
-        setTodayAppointments(todayRes.data || []);
+        setTodayAppointments(todayRes.rows);
+        setTodayCursor(todayRes.next);
         setFutureAppointments((futureRes.data || []).slice(0, 5));
         setPendingCount((pendingRes.data || []).length);
         setDoctorProfile(profileRes.data || {});
-        setPastAppointments(pastRes.data || []);
+        setPastAppointments(pastRes.rows);
+        setPastCursor(pastRes.next);
       } catch (err) {
         console.error('Failed to fetch dashboard data', err);
       } finally {
@@ -59,6 +73,35 @@ function DoctorDashboard() {
     fetchData();
   }, [user]);
 
+  const loadMore = async (list) => {
+    const pages = {
+      today: ['/today-visits', { 'Authorization-Id': user.user_id }, todayCursor, setTodayAppointments, setTodayCursor],
+      past: ['/past-visits', { Authorization: user.user_id }, pastCursor, setPastAppointments, setPastCursor],
+    };
+    const [url, headers, cursor, setRows, setCursor] = pages[list];
+    setLoadingMore(list);
+    try {
+      const { rows, next } = await fetchPage(url, headers, cursor);
+      setRows((prev) => [...prev, ...rows]);
+      setCursor(next);
+    } catch (err) {
+      console.error(`Failed to load more ${list} visits`, err);
+    } finally {
+      setLoadingMore(null);
+    }
+  };
+
+  const loadMoreButton = (list, cursor) => cursor && (
+    <Button
+      size="small"
+      onClick={() => loadMore(list)}
+      disabled={loadingMore === list}
+      sx={{ color: 'inherit' }}
+    >
+      {loadingMore === list ? 'Loading…' : 'Load more'}
+    </Button>
+  );
+
   const handleSelect = (appointment) => {
     navigate(`/appointment/${appointment.id}`);
   };
@@ -138,7 +181,7 @@ function DoctorDashboard() {
                 {todayAppointments.length === 0 ? (
                   <Typography>No appointments today.</Typography>
                 ) : (
-                  <List disablePadding>
+                  <List disablePadding sx={{ maxHeight: 190, overflowY: 'auto' }}>
                     {todayAppointments.map((appt) => (
                       <ListItemButton
                         key={appt.id}
@@ -153,6 +196,7 @@ function DoctorDashboard() {
                     ))}
                   </List>
                 )}
+                {loadMoreButton('today', todayCursor)}
               </CardContent>
             </Card>
           </Box>
@@ -192,7 +236,7 @@ function DoctorDashboard() {
                 {pastAppointments.length === 0 ? (
                   <Typography>No prior appointments.</Typography>
                 ) : (
-                  <List disablePadding>
+                  <List disablePadding sx={{ maxHeight: 190, overflowY: 'auto' }}>
                     {pastAppointments.map((appt) => (
                       <ListItemButton
                         key={appt.id}
@@ -207,6 +251,7 @@ function DoctorDashboard() {
                     ))}
                   </List>
                 )}
+                {loadMoreButton('past', pastCursor)}
               </CardContent>
             </Card>
           </Box>
@@ -418,12 +418,22 @@ export default function PatientDashboard() {
                             {r.content}
                           </Typography>
                           {r.image_url && (
+                            // list shows the small thumbnail; the original opens on click
                             <Box
-                              component="img"
-                              src={r.image_url}
-                              alt={r.type}
-                              sx={{ mt: 1, width: '100%', borderRadius: 1 }}
-                            />
+                              component="a"
+                              href={r.image_url}
+                              target="_blank"
+                              rel="noopener noreferrer"
+                              sx={{ display: 'block', mt: 1 }}
+                            >
+                              <Box
+                                component="img"
+                                src={r.thumbnail_url || r.image_url}
+                                alt={r.type}
+                                loading="lazy"
+                                sx={{ width: '100%', maxWidth: r.thumbnail_url ? 256 : '100%', borderRadius: 1 }}
+                              />
+                            </Box>
                           )}
                         </Box>
                         <Typography variant="body2" color="textSecondary">
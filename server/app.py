@@ -2,36 +2,75 @@
 import os
 import json
 import re
-from flask import Flask, request, jsonify
-from supabase import create_client, Client
-import openai
+from flask import Flask, request, jsonify, abort
 import speech_recognition as sr
 from werkzeug.utils import secure_filename
-from PIL import Image
-import pytesseract
 from dotenv import load_dotenv
 from flask_cors import CORS
+from flask_compress import Compress
 from datetime import datetime
-from audio_service import upload_audio_to_supabase, transcribe_with_whisper
+from audio_service import ingest_audio, transcribe_with_whisper
 from chat_routes import chat_routes  # <-- import
 from visit_routes import visit_routes
-from image_service import upload_image_to_supabase
+from image_service import upload_image_set, record_vision_usage, thumbnail_url_for
 import base64
 from wolfram_service import query_wolfram
+from vitals_calculator import annotate_visits, bmi, bmi_category, body_surface_area, format_bmi
+from cache import build_cache, TTLCache
+from invalidation import on_patient_change, patient_changed
+from query_executor import QueryBatch, get_llm_pool
+from job_queue import JobQueue
+from ocr_service import document_key, ocr_document
+from visit_timeline import fetch_visit_timeline
+from clients import auth_client, supabase, llm
+from joke_pool import JokePool
+from pagination import CursorError, NEXT_CURSOR_HEADER, page_args, with_next_cursor
+from roster import roster_page
+import patient_directory
+from response_versions import conditional, patient_version, skip_etag
+from json_provider import JSONProvider
+import metrics
 
 load_dotenv()
 
 
 app = Flask(__name__)
-CORS(app)
-
-# Supabase setup
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-
-llm = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+CORS(app, expose_headers=[NEXT_CURSOR_HEADER])
+
+# orjson-backed jsonify when available
+app.json = JSONProvider(app)
+
+# Negotiated brotli/gzip for JSON and text bodies above the size threshold;
+# event streams are left alone
+app.config['COMPRESS_ALGORITHM'] = os.getenv('COMPRESS_ALGORITHM', 'br,gzip').split(',')
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_LEVEL'] = int(os.getenv('COMPRESS_LEVEL', 6))
+app.config['COMPRESS_BR_LEVEL'] = int(os.getenv('COMPRESS_BR_LEVEL', 4))
+Compress(app)
+
+# LLM recommendations keyed on a content hash of the trend payload
+recommendation_cache = build_cache(
+    'trend_recommendations',
+    'RECOMMENDATION_CACHE',
+    default_ttl=6 * 3600
+)
+
+@on_patient_change
+def _invalidate_recommendations(patient_id, source):
+    if source == 'visits':
+        recommendation_cache.invalidate(patient_id)
+
+# Background jobs (audio transcription / summarization)
+job_queue = JobQueue(
+    os.getenv('JOB_QUEUE_PATH', os.path.join('.cache', 'jobs.sqlite3')),
+    workers=int(os.getenv('JOB_WORKERS', 2)),
+    lease=float(os.getenv('JOB_LEASE_SECONDS', 3600))
+)
+metrics.register('jobs', job_queue.stats)
+JOB_MAX_WAIT = float(os.getenv('JOB_MAX_WAIT', 30))
+
+# Pre-generated jokes for the dashboard widget, refilled in the background
+joke_pool = JokePool(llm)
 
 def get_current_user():
     user_id = request.headers.get('Authorization')
@@ -39,6 +78,40 @@ def get_current_user():
         return None
     return user_id
 
+def patient_data_version(patient_id, tables):
+    """
+    Version for conditional GETs on a patient's data; None (no ETag)
+    for unauthenticated requests.
+    """
+    if not get_current_user() or not patient_id:
+        return None
+    return patient_version(supabase, patient_id, tables)
+
+def visit_data_version(visit_id):
+    if not get_current_user():
+        return None
+    rows = supabase.table('visits').select('patient_id').eq('id', visit_id).limit(1).execute().data
+    if not rows:
+        return None
+    return patient_data_version(rows[0]['patient_id'], ('visits', 'questions', 'medications'))
+
+def wants_async():
+    flag = request.args.get('async') or request.form.get('async') or ''
+    return flag.lower() in ('1', 'true', 'yes')
+
+def max_points_arg():
+    # trend downsampling needs at least the first and last point
+    raw = request.args.get('max_points')
+    if raw is None:
+        return None
+    try:
+        max_points = int(raw)
+    except ValueError:
+        abort(400, description="max_points must be an integer")
+    if max_points < 2:
+        abort(400, description="max_points must be at least 2")
+    return max_points
+
 app.register_blueprint(visit_routes)
 # ---------- signin / signup API endpoints -------------- #
 @app.route('/signin', methods=['POST'])
@@ -48,7 +121,7 @@ def signin():
     password = data.get('password')
 
     try:
-        result = supabase.auth.sign_in_with_password({
+        result = auth_client().auth.sign_in_with_password({
             "email": email,
             "password": password
         })
@@ -86,7 +159,7 @@ def signup():
 
     try:
         # 1. Supabase Auth signup
-        result = supabase.auth.sign_up({
+        result = auth_client().auth.sign_up({
             "email": email,
             "password": password
         })
@@ -96,6 +169,8 @@ def signup():
         # 2. Save additional user info to database
         table = 'doctors' if role == 'doctor' else 'patients'
         supabase.table(table).insert([{ "id": user_id, **extra_info }]).execute()
+        if table == 'patients':
+            patient_changed(user_id, 'patients')
 
         # 3. Check if email verification is required
         if result.session is None:
@@ -113,6 +188,29 @@ def signup():
 def health():
     return jsonify(status='OK')
 
+@app.route('/api/metrics')
+def get_metrics():
+    return jsonify(metrics.snapshot()), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    user_id = get_current_user()
+    if not user_id:
+        return jsonify({"error": "unauthorized"}), 401
+
+    # ?wait=N long-polls for up to N seconds until the job finishes
+    wait = min(request.args.get('wait', 0, type=float), JOB_MAX_WAIT)
+    job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+    if not job or job['payload'].get('user_id') != user_id:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify({
+        "job_id": job['id'],
+        "status": job['status'],
+        "result": job['result'],
+        "error":  job['error']
+    }), 200
+
 @app.route('/api/patients', methods=['GET'])
 def get_patients():
     response = supabase.table('patients').select('*').execute()
@@ -170,100 +268,44 @@ def list_patients():
     if doctor_id is None:
         abort(400, description="Missing required query parameter: doctorId")
 
-    # 2) Fetch all visits for that doctor
-    visits_resp = (
-        supabase
-        .table('visits')
-        .select('patient_id, visitdate')
-        .eq('doctor_id', doctor_id)
-        .execute()
-    )
-    visits = visits_resp.data
-
-    # 3) Compute the latest visit date per patient
-    last_visits = {}
-    for v in visits:
-        pid      = v['patient_id']
-        date_str = v['visitdate'].split('T')[0]
-        if pid not in last_visits or date_str > last_visits[pid]:
-            last_visits[pid] = date_str
-
-    if not last_visits:
-        return jsonify([]), 200
-
-    # 4) Fetch patient names for just those IDs
-    patient_ids = list(last_visits.keys())
-    patients_resp = (
-        supabase
-        .table('patients')
-        .select('id, name')
-        .in_('id', patient_ids)
-        .execute()
-    )
-    patients = patients_resp.data
-
-    # 5) Build and return the payload
-    result = []
-    for p in patients:
-        pid = p['id']
-        result.append({
-            "patient_id": f"p{pid}",
-            "name":       p['name'],
-            "last_visit": last_visits.get(pid)
-        })
+    try:
+        limit, cursor = page_args(request.args)
+    except CursorError as e:
+        abort(400, description=str(e))
+
+    # 2) One page of the doctor's roster (name, last visit, visit count)
+    page, next_cursor = roster_page(supabase, doctor_id, limit, cursor)
+
+    # 3) Build and return the payload
+    result = [
+        {
+            "patient_id":  f"p{p['patient_id']}",
+            "name":        p['name'],
+            "last_visit":  p['last_visit'].split('T')[0] if p['last_visit'] else None,
+            "visit_count": p['visit_count']
+        }
+        for p in page
+    ]
 
-    return jsonify(result), 200
+    return with_next_cursor(jsonify(result), next_cursor), 200
 
 # Fetch the patient profile
 @app.route('/patient-profile/<patient_id>', methods=['GET'])
+@conditional(lambda patient_id: patient_data_version(patient_id, ('visits', 'questions')))
 def patient_profile(patient_id):
+    max_points = max_points_arg()
+
     # 1. Fetch patient_info
-    patient_resp = (
-        supabase
-        .table('patients')
-        .select('name, dob, email, phone, address, preferredlanguage')
-        .eq('id', patient_id)
-        .single()
-        .execute()
+    patient = patient_directory.get(
+        supabase, patient_id, ('name', 'dob', 'email', 'phone', 'address', 'preferredlanguage')
     )
-    if patient_resp.data is None:
+    if patient is None:
         abort(404, description="Patient not found")
-    patient = patient_resp.data
 
-    # 2. Fetch all visits for this patient
-    visits_resp = (
-        supabase
-        .table('visits')
-        .select('visitdate, content, bloodpressure, oxygenlevel, sugarlevel')
-        .eq('patient_id', patient_id)
-        .order('visitdate', desc=False)
-        .execute()
-    )
-    visits = visits_resp.data or []
-
-    # 3. Build health_trends and visit_history
-    blood_pressure = []
-    oxygen_level  = []
-    sugar_level   = []
-    visit_history = []
-
-    for v in visits:
-        date_str = v['visitdate'].split('T')[0]
-
-        if v.get('bloodpressure') is not None:
-            blood_pressure.append({'date': date_str, 'value': v['bloodpressure']})
-        if v.get('oxygenlevel') is not None:
-            oxygen_level.append({'date': date_str, 'value': v['oxygenlevel']})
-        if v.get('sugarlevel') is not None:
-            sugar_level.append({'date': date_str, 'value': v['sugarlevel']})
-
-        if v.get('content'):
-            visit_history.append({
-                'date':    date_str,
-                'summary': v['content']
-            })
+    # 2. Fetch all visits once and derive health_trends and visit_history
+    timeline = fetch_visit_timeline(supabase, patient_id)
 
-    # 4. Fetch pending (unanswered) questions
+    # 3. Fetch pending (unanswered) questions
     q_resp = (
         supabase
         .table('questions')
@@ -278,7 +320,7 @@ def patient_profile(patient_id):
         for q in questions
     ]
 
-    # 5. Return combined profile
+    # 4. Return combined profile
     return jsonify({
         'patient_info': {
             'name':  patient['name'],
@@ -288,12 +330,8 @@ def patient_profile(patient_id):
             'address': patient['address'],
             'preferredlanguage': patient['preferredlanguage']
         },
-        'health_trends': {
-            'blood_pressure': blood_pressure,
-            'oxygen_level':   oxygen_level,
-            'sugar_level':    sugar_level
-        },
-        'visit_history':     visit_history,
+        'health_trends':     timeline.trend_points(max_points),
+        'visit_history':     timeline.visit_history,
         'pending_questions': pending_questions
     }), 200
 
@@ -332,107 +370,91 @@ def create_visit():
 
     # 5) Return the newly created visit record
     created = resp.data[0]
+    patient_changed(created.get('patient_id'), 'visits')
     return jsonify(created), 201
 
 # patient apis #
 # ─── 1. Dashboard Data ────────────────────────────────────────────────────────
 @app.route("/dashboard-data", methods=["GET"])
+@conditional(lambda: patient_data_version(get_current_user(), ('visits', 'reports', 'questions', 'medications')))
 def dashboard_data():
     patient_id = get_current_user()
     if not patient_id:
         return jsonify({"error": "unauthorized"}), 401
 
-    # a) Latest visit as health summary
-    latest_resp = (
-        supabase
-        .table("visits")
-        .select("bloodpressure, oxygenlevel, sugarlevel, weight, height, doctorrecommendation, visitdate")
-        .eq("patient_id", patient_id)
-        .order("visitdate", desc=True)
-        .limit(1)
-        .execute()
-    )
-    latest = latest_resp.data or []
+    max_points = max_points_arg()
+
+    with QueryBatch("dashboard_data") as batch:
+        # a+b) Visits read once: latest visit as health summary plus the
+        #      trend series. The LLM call starts as soon as they are ready,
+        #      while the other reads are still in flight. It always sees the
+        #      full-resolution trends; max_points only shapes the chart.
+        batch.submit("timeline", fetch_visit_timeline, supabase, patient_id)
+        batch.then("trends", "timeline", lambda timeline: timeline.trends)
+        batch.then("recommendations", "trends", lambda trends: recommendation_cache.get_or_compute(
+            TTLCache.fingerprint({"kind": "trend", "trends": trends}),
+            lambda: trend_recommendations(trends),
+            namespace=patient_id,
+            cacheable=lambda recs: recs != RECOMMENDATION_FALLBACK
+        ), pool=get_llm_pool())
+
+        # c) All medications
+        batch.submit("medications", lambda: (
+            supabase
+            .table("medications")
+            .select("*")
+            .eq("patient_id", patient_id)
+            .execute()
+        ).data or [])
 
-    # b) Build full visit history for trends
-    visits_resp = (
-        supabase
-        .table("visits")
-        .select("visitdate, bloodpressure, oxygenlevel, sugarlevel")
-        .eq("patient_id", patient_id)
-        .order("visitdate", desc=False)
-        .execute()
-    )
-    visits = visits_resp.data or []
-
-    blood_pressure = []
-    oxygen_level  = []
-    sugar_level   = []
-    for v in visits:
-        date_str = v["visitdate"].split("T")[0]
-        if v.get("bloodpressure") is not None:
-            blood_pressure.append({"date": date_str, "value": v["bloodpressure"]})
-        if v.get("oxygenlevel") is not None:
-            oxygen_level.append({"date": date_str, "value": v["oxygenlevel"]})
-        if v.get("sugarlevel") is not None:
-            sugar_level.append({"date": date_str, "value": v["sugarlevel"]})
-
-    # c) All medications
-    meds = (
-        supabase
-        .table("medications")
-        .select("*")
-        .eq("patient_id", patient_id)
-        .execute()
-    ).data or []
+        # d) Active (unanswered) questions
+        batch.submit("questions", lambda: (
+            supabase
+            .table("questions")
+            .select("id, questiontext")
+            .eq("patient_id", patient_id)
+            .eq("status", "Not")
+            .execute()
+        ).data or [])
+
+        batch.submit("reports", lambda: (
+            supabase
+            .table("reports")
+            .select("id, reporttype, reportcontent, reportdate, image_url")
+            .eq("patient_id", patient_id)
+            .order("reportdate", desc=True)
+            .execute()
+        ).data or [])
+
+        timeline = batch.result("timeline")
+        meds = batch.result("medications")
+        active_qs = batch.result("questions")
+        reports = batch.result("reports")
+        llm_result = batch.result("recommendations")
+    if llm_result == RECOMMENDATION_FALLBACK:
+        skip_etag()
 
-    # d) Active (unanswered) questions
-    active_qs = (
-        supabase
-        .table("questions")
-        .select("id, questiontext")
-        .eq("patient_id", patient_id)
-        .eq("status", "Not")
-        .execute()
-    ).data or []
     # format questions as you like, e.g. prefixing id
     active_questions = [
         {"id": f"q{q['id']}", "question_text": q["questiontext"]}
         for q in active_qs
     ]
 
-    reports = (
-        supabase
-        .table("reports")
-        .select("id, reporttype, reportcontent, reportdate, image_url")
-        .eq("patient_id", patient_id)
-        .order("reportdate", desc=True)
-        .execute()
-    ).data or []
     formatted_reports = [
         {
             "report_id":      r["id"],
             "type":           r["reporttype"],
             "content":        r["reportcontent"],
             "date":           r["reportdate"],
-            "image_url":      r.get("image_url")
+            "image_url":      r.get("image_url"),
+            "thumbnail_url":  thumbnail_url_for(r.get("image_url"))
         }
         for r in reports
     ]
 
-    llm_result = trend_recommendations({
-            "blood_pressure": blood_pressure,
-            "oxygen_level":   oxygen_level,
-            "sugar_level":    sugar_level
-    })
-
     return jsonify({
-        "health_summary": latest[0] if latest else {},
-        "health_trends": {
-            "blood_pressure": blood_pressure,
-            "oxygen_level":   oxygen_level,
-            "sugar_level":    sugar_level
-        },
+        "health_summary":     timeline.latest_summary,
+        "health_trends":      timeline.trend_points(max_points),
         "medications":        meds,
         "active_questions":   active_questions,
         "recommendations":    llm_result,
@@ -470,7 +492,7 @@ def ask_ai():
         return jsonify({"error": "question is required"}), 400
 
     # Call GPT
-    resp = openai.ChatCompletion.create(
+    resp = llm.chat.completions.create(
         model="gpt-4",
         messages=[
             {"role": "system", "content": "You are a multilingual medical assistant."},
@@ -487,12 +509,47 @@ def ask_ai():
         "status":         "answered_by_ai",
         "daterecorded":   datetime.utcnow().isoformat()
     }).execute()
+    patient_changed(user_id, 'questions')
 
     return jsonify({"answer": answer})
 
 
 
 # ─── 3. Upload Question Audio ─────────────────────────────────────────────────
+def process_question_audio(payload, raw):
+    """
+    Job handler (also used inline): stores the audio, transcribes it and
+    records the question. Returns the JSON-able result.
+    """
+    # 1+2) Upload to Supabase Storage while Whisper transcribes
+    public_url, transcript = ingest_audio(
+        supabase,
+        os.getenv("SUPABASE_AUDIO_BUCKET", "audio-uploads"),
+        payload["filename"],
+        payload["mimetype"],
+        raw
+    )
+
+    # 3) Persist to your `questions` table
+    record = {
+        "patient_id":    payload["user_id"],
+        "questiontext":  transcript,
+        "questionaudio": public_url,
+        "status":        "Not",
+        "daterecorded":  datetime.utcnow().isoformat(),
+        "doctor_id":     payload.get("doctor_id"),
+        "visit_id":      payload.get("visit_id")
+    }
+    supabase.table("questions").insert(record).execute()
+    patient_changed(payload["user_id"], 'questions')
+
+    return {
+        "transcript": transcript,
+        "audioUrl":   public_url
+    }
+
+job_queue.register("question_audio", process_question_audio)
+
 @app.route("/upload-question-audio", methods=["POST"])
 def upload_question_audio():
     user_id = get_current_user()
@@ -503,40 +560,24 @@ def upload_question_audio():
     if not f:
         return jsonify({"error": "no file uploaded"}), 400
 
-    # 1) Upload to Supabase Storage
-    try:
-        public_url = upload_audio_to_supabase(
-            supabase,
-            os.getenv("SUPABASE_AUDIO_BUCKET", "audio-uploads"),
-            f
-        )
-    except Exception as e:
-        return jsonify({"error": f"Storage upload failed: {e}"}), 500
-
-    # 2) Transcribe with Whisper
+    payload = {
+        "user_id":   user_id,
+        "filename":  f.filename,
+        "mimetype":  f.mimetype,
+        "doctor_id": request.form.get('doctor_id'),
+        "visit_id":  request.form.get('visit_id')
+    }
     f.stream.seek(0)
     raw = f.read()
-    try:
-        transcript = transcribe_with_whisper(raw, f.filename)
-    except Exception as e:
-        return jsonify({"error": f"Transcription failed: {e}"}), 500
 
-    # 3) Persist to your `questions` table
-    record = {
-        "patient_id":    user_id,
-        "questiontext":  transcript,
-        "questionaudio": public_url,
-        "status":        "Not",
-        "daterecorded":  datetime.utcnow().isoformat(),
-        "doctor_id":     request.form.get('doctor_id'),
-        "visit_id":      request.form.get('visit_id')
-    }
-    supabase.table("questions").insert(record).execute()
+    if wants_async():
+        job_id = job_queue.enqueue("question_audio", payload, raw)
+        return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
 
-    return jsonify({
-        "transcript": transcript,
-        "audioUrl":   public_url
-    }), 200
+    try:
+        return jsonify(process_question_audio(payload, raw)), 200
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
 
 @app.route("/upload-question-audio-for-chat", methods=["POST"])
 def upload_question_audio_for_chat():
@@ -581,7 +622,7 @@ def get_past_visits():
         .limit(10)
         .execute()
     )
-    visits = resp.data or []
+    visits = annotate_visits(resp.data or [])
     return jsonify(visits), 200
 
 # ─── 6. Upload OCR Report ────────────────────────────────────────────────────
@@ -598,23 +639,67 @@ def upload_ocr_report():
     filename = secure_filename(f.filename)
     ext = os.path.splitext(filename)[1].lower()
 
-    # PDF → images → OCR, else image → OCR
-    if ext == ".pdf":
-        pages = convert_from_bytes(f.read())
-        text = "".join(pytesseract.image_to_string(page) for page in pages)
-    else:
-        img = Image.open(f.stream)
-        text = pytesseract.image_to_string(img)
+    # PDF → pages (lazily, OCR'd in parallel) → text, else image → OCR.
+    # Re-uploads are served from the OCR cache.
+    data = f.read()
+    text = ocr_document(data, ext)
+    content_hash = document_key(data)
+    report_type = ext.lstrip(".")
+
+    # Optional dedupe: link to an identical existing report instead of
+    # inserting another row
+    if wants_dedupe():
+        try:
+            existing = (
+                supabase
+                .table("reports")
+                .select("id")
+                .eq("patient_id", user_id)
+                .eq("reporttype", report_type)
+                .eq("content_hash", content_hash)
+                .limit(1)
+                .execute()
+            ).data or []
+        except Exception as e:
+            # e.g. sql/reports_content_hash.sql not applied yet
+            print('OCR report dedupe skipped:', e)
+            existing = []
+        if existing:
+            return jsonify({
+                "extracted_text": text,
+                "report_id":      existing[0]["id"],
+                "duplicate":      True
+            })
 
     # Save into reports
-    supabase.table("reports").insert({
+    report = {
         "patient_id":    user_id,
         "reportcontent": text,
-        "reporttype":   ext.lstrip("."),
+        "reporttype":   report_type,
+        "content_hash": content_hash,
         "reportdate":   datetime.utcnow().date().isoformat()
-    }).execute()
+    }
+    try:
+        resp = supabase.table("reports").insert(report).execute()
+    except Exception as e:
+        if "content_hash" not in str(e):
+            raise
+        # column not there yet: store the report without its hash
+        print('Saving report without content_hash:', e)
+        report.pop("content_hash")
+        resp = supabase.table("reports").insert(report).execute()
+    patient_changed(user_id, 'reports')
+
+    created = (resp.data or [{}])[0]
+    return jsonify({
+        "extracted_text": text,
+        "report_id":      created.get("id"),
+        "duplicate":      False
+    })
 
-    return jsonify({"extracted_text": text})
+def wants_dedupe():
+    flag = request.args.get('dedupe') or request.form.get('dedupe') or os.getenv('OCR_DEDUPE', '')
+    return flag.lower() in ('1', 'true', 'yes')
 
 @app.route('/upcoming-visits', methods=['GET'])
 def upcoming_visits():
@@ -752,87 +837,77 @@ def get_visit_by_id(visit_id):
 @app.route('/patient/<patient_id>', methods=['GET'])
 def get_patient_by_id(patient_id):
     try:
-        resp = (
-            supabase
-            .table('patients')
-            .select('id, name, dob, phone, address, preferredlanguage')
-            .eq('id', patient_id)
-            .single()
-            .execute()
+        patient = patient_directory.get(
+            supabase, patient_id, ('id', 'name', 'dob', 'phone', 'address', 'preferredlanguage')
         )
 
-        if not resp.data:
+        if not patient:
             return jsonify({'error': 'Patient not found'}), 404
 
-        return jsonify(resp.data), 200
+        return jsonify(patient), 200
 
     except Exception as e:
         print(e)
         return jsonify({'error': 'Internal Server Error'}), 500
 # app.py
 @app.route('/patient-summary/<patient_id>', methods=['GET'])
+@conditional(lambda patient_id: patient_data_version(patient_id, ('visits', 'reports', 'questions', 'medications')))
 def patient_summary(patient_id):
     user_id = get_current_user()
     if not user_id:
         return jsonify({"error": "unauthorized"}), 401
 
-    # a) Basic patient info
-    patient = supabase.table('patients') \
-        .select('id, name, dob, phone, address, preferredlanguage') \
-        .eq('id', patient_id) \
-        .single() \
-        .execute().data
-    if not patient:
-        abort(404, description="Patient not found")
-
-    # b) Last 5 visits with metrics
-    visits = supabase.table('visits') \
-        .select('visitdate, bloodpressure, oxygenlevel, sugarlevel') \
-        .eq('patient_id', patient_id) \
-        .order('visitdate', desc=True) \
-        .limit(5) \
-        .execute().data or []
-
-    # build trend arrays (ordered oldest→newest)
-    visits_sorted = sorted(visits, key=lambda v: v['visitdate'])
-    trends = {
-        "blood_pressure": [
-            {"date": v['visitdate'].split("T")[0], "value": v['bloodpressure']}
-            for v in visits_sorted if v.get('bloodpressure') is not None
-        ],
-        "oxygen_level": [
-            {"date": v['visitdate'].split("T")[0], "value": v['oxygenlevel']}
-            for v in visits_sorted if v.get('oxygenlevel') is not None
-        ],
-        "sugar_level": [
-            {"date": v['visitdate'].split("T")[0], "value": v['sugarlevel']}
-            for v in visits_sorted if v.get('sugarlevel') is not None
-        ]
-    }
+    with QueryBatch("patient_summary") as batch:
+        # a) Basic patient info
+        batch.submit("patient", patient_directory.get, supabase, patient_id,
+                     ('id', 'name', 'dob', 'phone', 'address', 'preferredlanguage'))
+
+        # b) Last 5 visits with metrics
+        batch.submit("timeline", fetch_visit_timeline, supabase, patient_id, 5)
+        batch.then("trends", "timeline", lambda timeline: timeline.trends)
+
+        # c) Other sections as before...
+        batch.submit("medications", lambda: supabase.table('medications') \
+            .select('medicationid, medicationname, dosage, frequency, startdate, enddate, notes') \
+            .eq('patient_id', patient_id) \
+            .order('startdate', desc=True) \
+            .execute().data or [])
+
+        batch.submit("reports", lambda: supabase.table('reports') \
+            .select('id, reporttype, reportcontent, reportdate, image_url') \
+            .eq('patient_id', patient_id) \
+            .order('reportdate', desc=True) \
+            .execute().data or [])
+
+        batch.submit("questions", lambda: supabase.table('questions') \
+            .select('id, patient_id, doctor_id, questiontext, daterecorded') \
+            .eq('patient_id', patient_id) \
+            .eq('doctor_id', user_id) \
+            .eq('status', 'Not') \
+            .order('daterecorded', desc=True) \
+            .execute().data or [])
+
+        patient = batch.result("patient")
+        if not patient:
+            abort(404, description="Patient not found")
+
+        # the LLM call waits for the patient check, so a 404 never pays for
+        # it; it still starts as soon as the trends arrive
+        batch.then("recommendation", "trends", lambda trends: recommendation_cache.get_or_compute(
+            TTLCache.fingerprint({"kind": "summary", "trends": trends}),
+            lambda: generate_recommendation(trends),
+            namespace=patient_id
+        ), pool=get_llm_pool())
+
+        visits = batch.result("timeline").recent(
+            ('visitdate', 'bloodpressure', 'oxygenlevel', 'sugarlevel')
+        )
+        meds = batch.result("medications")
+        reports = batch.result("reports")
+        questions = batch.result("questions")
 
-    # c) Other sections as before...
-    meds = supabase.table('medications') \
-        .select('medicationid, medicationname, dosage, frequency, startdate, enddate, notes') \
-        .eq('patient_id', patient_id) \
-        .order('startdate', desc=True) \
-        .execute().data or []
-
-    reports = supabase.table('reports') \
-        .select('id, reporttype, reportcontent, reportdate, image_url') \
-        .eq('patient_id', patient_id) \
-        .order('reportdate', desc=True) \
-        .execute().data or []
-
-    questions = supabase.table('questions') \
-        .select('id, patient_id, doctor_id, questiontext, daterecorded') \
-        .eq('patient_id', patient_id) \
-        .eq('doctor_id', user_id) \
-        .eq('status', 'Not') \
-        .order('daterecorded', desc=True) \
-        .execute().data or []
-
-    # d) Generate single recommendation sentence
-    recommendation = generate_recommendation(trends)
+        # d) Single recommendation sentence
+        recommendation = batch.result("recommendation")
     print("recommendation: ", recommendation)
 
     return jsonify({
@@ -892,6 +967,7 @@ def create_appointment():
             'visitdate': visitdate,
             'content': memo or '',
         }).execute()
+        patient_changed(patient_id, 'visits')
 
         return jsonify({'message': 'Appointment created successfully'}), 200
 
@@ -900,6 +976,42 @@ def create_appointment():
         return jsonify({'error': 'Internal Server Error'}), 500
 
 # summarize audio
+def process_summarize_audio(payload, raw):
+    """
+    Job handler (also used inline): stores the recording, transcribes it
+    and summarizes the transcript for the visit record.
+    """
+    # 1+2. Upload while Whisper transcribes
+    audio_url, transcript = ingest_audio(
+        supabase,
+        os.getenv("SUPABASE_AUDIO_BUCKET", "audio-uploads"),
+        payload["filename"],
+        payload["mimetype"],
+        raw
+    )
+
+    # 3. Summarize
+    try:
+        resp = llm.chat.completions.create(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": "Summarize the following medical visit notes in a clear, short paragraph suitable for a patient summary. Keep it easy to understand, concise, and professional."},
+                {"role": "user", "content": transcript}
+            ],
+            temperature=0.5
+        )
+        summary = resp.choices[0].message.content
+    except Exception as e:
+        raise RuntimeError(f"Summarization failed: {e}")
+
+    return {
+        "transcript": transcript,
+        "summary": summary,
+        "audioUrl": audio_url
+    }
+
+job_queue.register("summarize_audio", process_summarize_audio)
+
 @app.route('/summarize-audio', methods=['POST'])
 def summarize_audio():
     user_id = get_current_user()
@@ -910,47 +1022,28 @@ def summarize_audio():
     if not f:
         return jsonify({"error": "no file uploaded"}), 400
 
-    # 1. Transcribe
+    payload = {
+        "user_id":  user_id,
+        "filename": f.filename,
+        "mimetype": f.mimetype
+    }
     f.stream.seek(0)
     raw = f.read()
-    try:
-        # Upload first (need fresh FileStorage because we just read it)
-        f.stream.seek(0)
-        audio_url = upload_audio_to_supabase(
-            supabase,
-            os.getenv("SUPABASE_AUDIO_BUCKET", "audio-uploads"),
-            f
-        )
-    except Exception as e:
-        print("Upload error:", e)
-        return jsonify({"error": f"Storage upload failed: {e}"}), 500
 
+    if wants_async():
+        job_id = job_queue.enqueue("summarize_audio", payload, raw)
+        return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
 
     try:
-        transcript = transcribe_with_whisper(raw, f.filename)
-    except Exception as e:
-        return jsonify({"error": f"Transcription failed: {e}"}), 500
-
-    # 2. Summarize
-    try:
-        client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        resp = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "Summarize the following medical visit notes in a clear, short paragraph suitable for a patient summary. Keep it easy to understand, concise, and professional."},
-                {"role": "user", "content": transcript}
-            ],
-            temperature=0.5
-        )
-        summary = resp.choices[0].message.content
-    except Exception as e:
-        return jsonify({"error": f"Summarization failed: {e}"}), 500
+        return jsonify(process_summarize_audio(payload, raw)), 200
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
 
-    return jsonify({
-        "transcript": transcript,
-        "summary": summary,
-        "audioUrl": audio_url
-    }), 200
+RECOMMENDATION_FALLBACK = {
+    "blood_pressure_info": "Unable to generate recommendation.",
+    "oxygen_level_info":   "Unable to generate recommendation.",
+    "sugar_level_info":    "Unable to generate recommendation."
+}
 
 def trend_recommendations(trendData):
     """
@@ -1001,12 +1094,8 @@ def trend_recommendations(trendData):
     try:
         recs = json.loads(json_str)
     except Exception:
-        # fallback if LLM response isn't valid JSON
-        recs = {
-            "blood_pressure_info": "Unable to generate recommendation.",
-            "oxygen_level_info":   "Unable to generate recommendation.",
-            "sugar_level_info":    "Unable to generate recommendation."
-        }
+        # fallback if LLM response isn't valid JSON (never cached)
+        recs = dict(RECOMMENDATION_FALLBACK)
 
     print("Final response: ", recs)
     return recs
@@ -1024,13 +1113,14 @@ def summarize_image():
     if not f:
         return jsonify({"error": "no file uploaded"}), 400
 
-    # 1. Upload to Supabase Storage
+    # 1. Upload original + vision-sized derivative + thumbnail
     try:
-        image_url = upload_image_to_supabase(
+        images = upload_image_set(
             supabase,
             os.getenv("SUPABASE_IMAGE_BUCKET", "image-uploads"),
             f
         )
+        image_url = images["original_url"]
 
     except Exception as e:
         print('Image upload error:', e)
@@ -1038,9 +1128,7 @@ def summarize_image():
 
     # 2. OCR and Summarization
     try:
-        client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
-        vision_response = client.chat.completions.create(
+        vision_response = llm.chat.completions.create(
             model="gpt-4o",
             messages=[
                 {
@@ -1057,7 +1145,7 @@ def summarize_image():
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": image_url
+                                "url": images["vision_url"]
                             }
                         }
                     ]
@@ -1067,7 +1155,8 @@ def summarize_image():
         )
 
         summary = vision_response.choices[0].message.content
-
+        if vision_response.usage:
+            record_vision_usage(vision_response.usage.prompt_tokens)
 
     except Exception as e:
         print('Image summarization error:', e)
@@ -1076,6 +1165,7 @@ def summarize_image():
     return jsonify({
         "summary": summary,
         "imageUrl": image_url,
+        "thumbnailUrl": images["thumbnail_url"],
         "reporttype": "Report"
     }), 200
 
@@ -1099,6 +1189,7 @@ def add_report():
             'reportdate': datetime.utcnow().isoformat(),
             'image_url': image_url
         }).execute()
+        patient_changed(patient_id, 'reports')
 
         return jsonify({"message": "Report added successfully"}), 200
 
@@ -1109,50 +1200,44 @@ def add_report():
 
 
 
-# BMI calculator using WOLFRAM ALPHA API
+# BMI calculator (computed locally; Wolfram only answers free-form questions)
 @app.route('/calculate-bmi', methods=['POST'])
 def calculate_bmi():
     user_id = get_current_user()
     if not user_id:
         return jsonify({"error": "unauthorized"}), 401
 
-    data = request.get_json()
+    data = request.get_json() or {}
     weight = data.get('weight')  # in kg
     height = data.get('height')  # in cm
+    question = data.get('question')
+
+    if question:
+        try:
+            return jsonify({"bmi_result": query_wolfram(question)}), 200
+        except Exception as e:
+            print('Error in calculate_bmi:', e)
+            return jsonify({"error": "Internal Server Error"}), 500
 
     if weight is None or height is None:
         return jsonify({"error": "Missing weight or height"}), 400
 
-    try:
-        question = f"What is the BMI of {weight} kilograms and {height} centimeters?"
-        answer = query_wolfram(question)
-        return jsonify({"bmi_result": answer}), 200
-    except Exception as e:
-        print('Error in calculate_bmi:', e)
-        return jsonify({"error": "Internal Server Error"}), 500
+    value = bmi(weight, height)
+    if value is None:
+        return jsonify({"error": "Weight and height must be positive numbers"}), 400
+
+    return jsonify({
+        "bmi_result":        format_bmi(value),
+        "bmi":               value,
+        "category":          bmi_category(value),
+        "body_surface_area": body_surface_area(weight, height)
+    }), 200
 
 # GET /health-joke
 @app.route('/health-joke', methods=['GET'])
 def health_joke():
     try:
-        client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        response = client.chat.completions.create(
-            model="gpt-4o",  # You can use gpt-4 or gpt-4o
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a dad joke generator specializing in health and wellness topics. Always respond with a short, funny, light-hearted joke related to health, medicine, or fitness."
-                },
-                {
-                    "role": "user",
-                    "content": "Tell me a random health-related dad joke."
-                }
-            ],
-            temperature=0.8,   # <-- a little more random
-            max_tokens=100
-        )
-        joke = response.choices[0].message.content
-        return jsonify({"joke": joke})
+        return jsonify({"joke": joke_pool.take()})
 
     except Exception as e:
         print('Error generating health joke:', e)
@@ -1179,7 +1264,9 @@ def update_visit(visit_id):
         if not update_fields:
             return jsonify({"error": "No valid fields to update"}), 400
 
-        supabase.table('visits').update(update_fields).eq('id', visit_id).execute()
+        resp = supabase.table('visits').update(update_fields).eq('id', visit_id).execute()
+        for row in resp.data or []:
+            patient_changed(row.get('patient_id'), 'visits')
 
         return jsonify({"message": "Visit updated successfully"}), 200
 
@@ -1210,6 +1297,7 @@ def add_medication():
             'enddate': enddate,
             'notes': notes
         }).execute()
+        patient_changed(patient_id, 'medications')
 
         return jsonify({'message': 'Medication added successfully'}), 200
 
@@ -1220,6 +1308,7 @@ def add_medication():
 
 
 @app.route('/visit-detail/<visit_id>', methods=['GET'])
+@conditional(visit_data_version)
 def visit_detail(visit_id):
     user_id = get_current_user()
     if not user_id:
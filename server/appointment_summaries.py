@@ -0,0 +1,294 @@
+# server/appointment_summaries.py
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from supabase import Client
+
+from invalidation import on_patient_change
+import patient_directory
+from query_executor import get_pool
+
+APPOINTMENT_SUMMARY_MODEL = os.getenv('APPOINTMENT_SUMMARY_MODEL', 'gpt-4o')
+# Stored summaries older than this are regenerated even without a change event
+APPOINTMENT_SUMMARY_MAX_AGE = float(os.getenv('APPOINTMENT_SUMMARY_MAX_AGE', 24 * 3600))
+# How far ahead the precompute job looks for scheduled visits
+APPOINTMENT_PRECOMPUTE_HORIZON = float(os.getenv('APPOINTMENT_PRECOMPUTE_HORIZON', 36 * 3600))
+# Seconds between precompute runs; 0 disables the in-process scheduler
+APPOINTMENT_PRECOMPUTE_INTERVAL = float(os.getenv('APPOINTMENT_PRECOMPUTE_INTERVAL', 3600))
+# The in-process scheduler is opt-in: enable it in exactly one process (or
+# run `python appointment_summaries.py` from cron instead), otherwise every
+# worker and the reloader would precompute the same summaries
+APPOINTMENT_PRECOMPUTE_SCHEDULER = os.getenv('APPOINTMENT_PRECOMPUTE_SCHEDULER', 'false').lower() == 'true'
+APPOINTMENT_SUMMARY_CONCURRENCY = int(os.getenv('APPOINTMENT_SUMMARY_CONCURRENCY', 4))
+
+_llm_pool = ThreadPoolExecutor(
+    max_workers=APPOINTMENT_SUMMARY_CONCURRENCY,
+    thread_name_prefix='appointment-summary'
+)
+_lock = threading.Lock()
+# set to a fresh number on every change so a generation racing an
+# invalidation is discarded; numbers are never reused, so pruning is safe
+_versions = {}
+_version_counter = itertools.count(1)
+# last change seen per patient; stored summaries older than it are stale
+_changed_at = {}
+# both maps only matter for APPOINTMENT_SUMMARY_MAX_AGE after a change
+_PRUNE_INTERVAL = 600
+_pruned_at = time.monotonic()
+_stats = {"precompute_runs": 0, "generated": 0, "served_stored": 0, "served_on_demand": 0, "invalidated": 0}
+
+
+def stats():
+    with _lock:
+        return dict(_stats)
+
+
+def _count(key, n=1):
+    with _lock:
+        _stats[key] += n
+
+
+def _version(patient_id):
+    with _lock:
+        return _versions.get(patient_id, 0)
+
+
+def build_prompt(patient, visits, reports):
+    prompt = f"""
+You are a concise and helpful AI medical assistant.
+
+Summarize the patient's recent health data to help the doctor prepare.
+Please output **only** the final summary line, formatted exactly like:
+Summary: summary text only
+
+Patient Info:
+- Name: {patient['name']}
+- DOB: {patient['dob']}
+- Preferred Language: {patient['preferredlanguage']}
+
+Recent Visits:
+"""
+    for v in visits:
+        prompt += f"\n• {v['visitdate']}: "
+        if v.get('bloodpressure'):      prompt += f"BP: {v['bloodpressure']}. "
+        if v.get('oxygenlevel'):       prompt += f"O₂: {v['oxygenlevel']}%. "
+        if v.get('sugarlevel'):        prompt += f"BG: {v['sugarlevel']} mg/dL. "
+        if v.get('doctorrecommendation'): prompt += f"Note: {v['doctorrecommendation']}."
+
+    prompt += "\n\nRecent Reports:"
+    for r in reports:
+        prompt += f"\n• {r['reportdate']}: {(r.get('reportcontent') or '')[:300]}..."
+    return prompt
+
+
+def generate_summary(supabase: Client, llm, patient_id):
+    """
+    Builds the summary from the patient's 3 latest visits and reports.
+    Returns None if the patient does not exist.
+    """
+    patient = patient_directory.get(supabase, patient_id)
+    if not patient:
+        return None
+
+    visits = (
+        supabase.table('visits')
+        .select('visitdate, bloodpressure, oxygenlevel, sugarlevel, doctorrecommendation')
+        .eq('patient_id', patient_id)
+        .order('visitdate', desc=True)
+        .limit(3)
+        .execute()
+    ).data or []
+
+    reports = (
+        supabase.table('reports')
+        .select('reportdate, reportcontent')
+        .eq('patient_id', patient_id)
+        .order('reportdate', desc=True)
+        .limit(3)
+        .execute()
+    ).data or []
+
+    res = llm.chat.completions.create(
+        model=APPOINTMENT_SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a concise and helpful AI medical assistant."},
+            {"role": "user", "content": build_prompt(patient, visits, reports)}
+        ],
+        temperature=0
+    )
+    _count("generated")
+    return res.choices[0].message.content
+
+
+def _is_fresh(row):
+    generated_at = datetime.fromisoformat(row['generated_at'].replace('Z', '+00:00'))
+    if generated_at.tzinfo is None:
+        generated_at = generated_at.replace(tzinfo=timezone.utc)
+    with _lock:
+        changed_at = _changed_at.get(row['patient_id'])
+    if changed_at and generated_at <= changed_at:
+        return False
+    age = (datetime.now(timezone.utc) - generated_at).total_seconds()
+    return age < APPOINTMENT_SUMMARY_MAX_AGE
+
+
+def load_summaries(supabase: Client, patient_ids):
+    """
+    Fresh stored summaries for the given patients, as {patient_id: summary}.
+    """
+    if not patient_ids:
+        return {}
+    rows = (
+        supabase.table('appointment_summaries')
+        .select('patient_id, summary, generated_at')
+        .in_('patient_id', list(patient_ids))
+        .execute()
+    ).data or []
+    return {r['patient_id']: r['summary'] for r in rows if _is_fresh(r)}
+
+
+def store_summary(supabase: Client, patient_id, summary, version):
+    # a change arrived while generating: the summary is already out of date
+    if _version(patient_id) != version:
+        return False
+    supabase.table('appointment_summaries').upsert({
+        'patient_id':   patient_id,
+        'summary':      summary,
+        'generated_at': datetime.now(timezone.utc).isoformat()
+    }).execute()
+    return True
+
+
+def get_summary(supabase: Client, llm, patient_id):
+    """
+    Serves the precomputed summary when there is a fresh one, otherwise
+    generates it on demand and stores it for the next request.
+    """
+    try:
+        stored = load_summaries(supabase, [patient_id]).get(patient_id)
+    except Exception as e:
+        print('Loading stored appointment summary failed:', e)
+        stored = None
+    if stored is not None:
+        _count("served_stored")
+        return stored
+
+    version = _version(patient_id)
+    summary = generate_summary(supabase, llm, patient_id)
+    if summary is None:
+        return None
+    _count("served_on_demand")
+    try:
+        store_summary(supabase, patient_id, summary, version)
+    except Exception as e:
+        print('Storing appointment summary failed:', e)
+    return summary
+
+
+def precompute_upcoming(supabase: Client, llm, horizon=APPOINTMENT_PRECOMPUTE_HORIZON):
+    """
+    Generates summaries for every patient with an open visit between the
+    start of today and `horizon` seconds from now that has no fresh stored summary. At most
+    APPOINTMENT_SUMMARY_CONCURRENCY LLM calls run at once. Returns the
+    number of summaries stored.
+    """
+    now = datetime.utcnow()
+    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    upcoming = (
+        supabase.table('visits')
+        .select('patient_id')
+        .gte('visitdate', start_of_day.isoformat())
+        .lte('visitdate', (now + timedelta(seconds=horizon)).isoformat())
+        .eq('status', False)
+        .execute()
+    ).data or []
+
+    patient_ids = {v['patient_id'] for v in upcoming if v.get('patient_id')}
+    pending = patient_ids - set(load_summaries(supabase, patient_ids))
+
+    def _one(patient_id):
+        version = _version(patient_id)
+        try:
+            summary = generate_summary(supabase, llm, patient_id)
+            return summary is not None and store_summary(supabase, patient_id, summary, version)
+        except Exception as e:
+            print(f"Appointment summary precompute failed for {patient_id}:", e)
+            return False
+
+    stored = sum(_llm_pool.map(_one, pending))
+    _count("precompute_runs")
+    print(f"Appointment summaries: {len(patient_ids)} upcoming patients, "
+          f"{len(pending)} generated, {stored} stored")
+    return stored
+
+
+def start_scheduler(supabase: Client, llm, interval=APPOINTMENT_PRECOMPUTE_INTERVAL):
+    """
+    Runs precompute_upcoming every `interval` seconds on a daemon thread,
+    when APPOINTMENT_PRECOMPUTE_SCHEDULER is enabled.
+    """
+    if not APPOINTMENT_PRECOMPUTE_SCHEDULER or interval <= 0:
+        return None
+
+    def _loop():
+        while True:
+            try:
+                precompute_upcoming(supabase, llm)
+            except Exception as e:
+                print('Appointment summary precompute run failed:', e)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=_loop, name='appointment-precompute', daemon=True)
+    thread.start()
+    return thread
+
+
+def _prune():
+    """
+    Forgets changes older than APPOINTMENT_SUMMARY_MAX_AGE: summaries
+    generated before them are stale by age anyway. Caller holds _lock.
+    """
+    global _pruned_at
+    if time.monotonic() - _pruned_at < _PRUNE_INTERVAL:
+        return
+    _pruned_at = time.monotonic()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=APPOINTMENT_SUMMARY_MAX_AGE)
+    for patient_id in [p for p, changed in _changed_at.items() if changed < cutoff]:
+        del _changed_at[patient_id]
+        _versions.pop(patient_id, None)
+
+
+def invalidate_on_change(supabase: Client):
+    """
+    Drops a patient's stored summary when their visits or reports change.
+    The delete runs off the request thread.
+    """
+    @on_patient_change
+    def _invalidate(patient_id, source):
+        if source not in ('visits', 'reports'):
+            return
+        with _lock:
+            _versions[patient_id] = next(_version_counter)
+            _changed_at[patient_id] = datetime.now(timezone.utc)
+            _stats["invalidated"] += 1
+            _prune()
+
+        def _delete():
+            try:
+                supabase.table('appointment_summaries').delete().eq('patient_id', patient_id).execute()
+            except Exception as e:
+                print(f"Dropping appointment summary for {patient_id} failed:", e)
+
+        get_pool().submit(_delete)
+
+    return _invalidate
+
+
+if __name__ == '__main__':
+    # one-off run, e.g. from cron: python appointment_summaries.py
+    from clients import get_openai, get_supabase
+    precompute_upcoming(get_supabase(), get_openai())
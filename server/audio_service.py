@@ -1,17 +1,32 @@
+import hashlib
 import io
-import os
-from openai import OpenAI
+import threading
 from datetime import datetime
 from supabase import Client
 from dotenv import load_dotenv
+from query_executor import QueryBatch, get_llm_pool
+from cache import build_cache
+from clients import llm
+import metrics
 
 load_dotenv()
 
-# load your OPENAI_API_KEY from env
-client = OpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY"),
+WHISPER_MODEL = "whisper-1"
+
+# Transcripts keyed on sha256(model + audio bytes), kept on disk by default
+transcription_cache = build_cache(
+    'transcriptions',
+    'TRANSCRIPTION_CACHE',
+    default_ttl=30 * 24 * 3600,
+    default_max_entries=10000,
+    default_backend='sqlite',
+    default_max_bytes=50 * 1024 * 1024
 )
 
+_stats_lock = threading.Lock()
+_transcription_stats = {"upstream_calls": 0, "bytes_sent": 0, "bytes_saved": 0}
+metrics.register('transcription', lambda: dict(_transcription_stats))
+
 def upload_audio_to_supabase(
     supabase: Client,
     bucket_name: str,
@@ -21,36 +36,112 @@ def upload_audio_to_supabase(
     Uploads raw bytes from Flask’s FileStorage into Supabase Storage
     and returns its public URL.
     """
-    ts      = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    safe_fn = file_obj.filename.replace(" ", "_")
-    path    = f"audio/{ts}_{safe_fn}"
-
     # read into bytes
     file_obj.stream.seek(0)
     data: bytes = file_obj.read()
 
+    return upload_audio_bytes(
+        supabase, bucket_name, file_obj.filename, file_obj.mimetype, data
+    )
+
+def upload_audio_bytes(
+    supabase: Client,
+    bucket_name: str,
+    filename: str,
+    mimetype: str,
+    data: bytes
+) -> str:
+    """
+    Uploads already-read audio bytes into Supabase Storage and returns
+    its public URL.
+    """
+    ts      = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    safe_fn = filename.replace(" ", "_")
+    path    = f"audio/{ts}_{safe_fn}"
+
     # upload per Supabase docs
     supabase.storage.from_(bucket_name).upload(
         file         = data,
         path         = path,
-        file_options = {"content-type": file_obj.mimetype}
+        file_options = {"content-type": mimetype}
     )
 
     # get public URL (returns a plain string)
     public_url: str = supabase.storage.from_(bucket_name).get_public_url(path)
     return public_url
 
+def transcription_key(file_bytes: bytes, model: str = WHISPER_MODEL) -> str:
+    """
+    Content address of a transcription: SHA-256 over model name + audio.
+    """
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(file_bytes)
+    return digest.hexdigest()
+
 def transcribe_with_whisper(file_bytes: bytes, filename: str) -> str:
     """
     Uses OpenAI Whisper to transcribe arbitrary audio.
+    Identical audio is served from the transcription cache, and concurrent
+    uploads of the same bytes share a single Whisper call.
+    """
+    upstream = []
+
+    def _call():
+        upstream.append(True)
+        return _whisper_transcribe(file_bytes, filename)
+
+    transcript = transcription_cache.get_or_compute(transcription_key(file_bytes), _call)
+
+    with _stats_lock:
+        if upstream:
+            _transcription_stats["upstream_calls"] += 1
+            _transcription_stats["bytes_sent"] += len(file_bytes)
+        else:
+            _transcription_stats["bytes_saved"] += len(file_bytes)
+    return transcript
+
+def _whisper_transcribe(file_bytes: bytes, filename: str) -> str:
+    """
     We set `audio.name` so Whisper knows the format by extension.
     """
-    audio = io.BytesIO(file_bytes)
+    audio = io.BytesIO(file_bytes)  # shares the bytes buffer until written
     audio.name = filename
-    resp = client.audio.transcriptions.create(
-        model="whisper-1",
+    resp = llm.audio.transcriptions.create(
+        model=WHISPER_MODEL,
         file=audio,
         response_format='text'
     )
     print("Response: ", resp)
     return resp
+
+def ingest_audio(
+    supabase: Client,
+    bucket_name: str,
+    filename: str,
+    mimetype: str,
+    data: bytes
+) -> tuple:
+    """
+    Uploads the recording to Supabase Storage and transcribes it with
+    Whisper concurrently, so wall time is roughly max(upload, transcribe).
+    Both sides share the same immutable `data` buffer; nothing is re-read
+    or copied. Returns (public_url, transcript).
+    """
+    with QueryBatch("audio_ingest") as batch:
+        batch.submit("upload", upload_audio_bytes, supabase, bucket_name, filename, mimetype, data)
+        batch.submit("transcribe", transcribe_with_whisper, data, filename, pool=get_llm_pool())
+
+        try:
+            public_url = batch.result("upload")
+        except Exception as e:
+            print("Upload error:", e)
+            raise RuntimeError(f"Storage upload failed: {e}")
+
+        try:
+            transcript = batch.result("transcribe")
+        except Exception as e:
+            raise RuntimeError(f"Transcription failed: {e}")
+
+    return public_url, transcript
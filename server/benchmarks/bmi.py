@@ -0,0 +1,73 @@
+# server/benchmarks/bmi.py
+"""
+Compares the local vitals_calculator against the Wolfram round-trip that
+/calculate-bmi used to make for every request.
+
+    cd server
+    python -m benchmarks.bmi [--iterations 100000] [--wolfram 5]
+
+The Wolfram leg only runs when --wolfram > 0 and WOLFRAM_API_KEY is set.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+from vitals_calculator import annotate_visits, bmi, format_bmi
+
+
+def sample_visits(n):
+    rng = random.Random(0)
+    return [{
+        'weight':        round(rng.uniform(45, 120), 1),
+        'height':        round(rng.uniform(150, 200), 1),
+        'bloodpressure': f"{rng.randint(100, 160)}/{rng.randint(60, 95)}",
+    } for _ in range(n)]
+
+
+def bench_local(iterations):
+    visits = sample_visits(1000)
+    start = time.perf_counter()
+    for i in range(iterations):
+        v = visits[i % len(visits)]
+        format_bmi(bmi(v['weight'], v['height']))
+    single_us = (time.perf_counter() - start) / iterations * 1e6
+
+    start = time.perf_counter()
+    annotate_visits(visits)
+    batch_ms = (time.perf_counter() - start) * 1000
+    return single_us, batch_ms
+
+
+def bench_wolfram(calls):
+    from wolfram_service import query_wolfram
+
+    timings = []
+    for v in sample_visits(calls):
+        start = time.perf_counter()
+        query_wolfram(f"What is the BMI of {v['weight']} kilograms and {v['height']} centimeters?")
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=100000)
+    parser.add_argument('--wolfram', type=int, default=0, help='number of Wolfram calls')
+    args = parser.parse_args()
+
+    single_us, batch_ms = bench_local(args.iterations)
+    print(f"local:   {single_us:.2f} us per BMI, {batch_ms:.2f} ms to annotate 1000 visits")
+
+    if args.wolfram > 0:
+        if not os.getenv('WOLFRAM_API_KEY'):
+            raise SystemExit("WOLFRAM_API_KEY is not set")
+        timings = bench_wolfram(args.wolfram)
+        median = statistics.median(timings)
+        print(f"wolfram: {median:.1f} ms median over {len(timings)} calls "
+              f"(~{median * 1000 / single_us:,.0f}x slower)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# server/benchmarks/cold_start.py
+"""
+Measures app import time and the cost of building an OpenAI client per
+request versus reusing the shared one from the clients registry.
+
+    cd server
+    python -m benchmarks.cold_start [--imports 5] [--requests 20] [--url http://localhost:5000/health-joke]
+
+Import time is taken in fresh interpreters. With --url, end-to-end latency
+of a running server is sampled as well (pass -H for auth headers).
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app; print((time.perf_counter() - t) * 1000)"
+
+
+def import_times(runs):
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-c', IMPORT_SNIPPET],
+            capture_output=True, text=True, check=True
+        )
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def construction_times(runs):
+    import openai
+    from clients import get_openai
+
+    fresh = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        openai.OpenAI(api_key='benchmark')
+        fresh.append((time.perf_counter() - start) * 1000)
+
+    get_openai()
+    shared = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        get_openai()
+        shared.append((time.perf_counter() - start) * 1000)
+    return fresh, shared
+
+
+def request_times(url, runs, headers):
+    session = requests.Session()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        session.get(url, headers=headers, timeout=120)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(label, timings):
+    print(f"{label:28} median {statistics.median(timings):9.3f} ms   "
+          f"min {min(timings):9.3f} ms   n={len(timings)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--imports', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--url')
+    parser.add_argument('-H', '--header', action='append', default=[], help='Name: value')
+    args = parser.parse_args()
+
+    summarize('import app', import_times(args.imports))
+
+    fresh, shared = construction_times(args.requests)
+    summarize('OpenAI() per request', fresh)
+    summarize('shared client lookup', shared)
+
+    if args.url:
+        headers = dict(h.split(':', 1) for h in args.header)
+        headers = {k.strip(): v.strip() for k, v in headers.items()}
+        summarize(f'GET {args.url}', request_times(args.url, args.requests, headers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# server/benchmarks/ocr_preprocess.py
+"""
+Compares per-page Tesseract latency and output with and without the
+ocr_preprocess pipeline over a folder of sample report images.
+
+    cd server
+    python -m benchmarks.ocr_preprocess samples/ [--steps resize,grayscale,...]
+
+If a `<name>.txt` ground-truth file sits next to an image, character
+accuracy against it is reported as well.
+"""
+import argparse
+import difflib
+import os
+import time
+
+import pytesseract
+from PIL import Image
+
+from ocr_preprocess import OCR_PREPROCESS, preprocess
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.webp')
+
+
+def similarity(a, b):
+    return difflib.SequenceMatcher(None, a.split(), b.split()).ratio()
+
+
+def run(path, steps):
+    with Image.open(path) as img:
+        img.load()
+
+    start = time.perf_counter()
+    raw_text = pytesseract.image_to_string(img)
+    raw_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    prepared = preprocess(img, steps)
+    prep_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    prep_text = pytesseract.image_to_string(prepared)
+    ocr_ms = (time.perf_counter() - start) * 1000
+
+    row = {
+        'file':      os.path.basename(path),
+        'pixels':    f"{img.width}x{img.height}",
+        'raw_ms':    raw_ms,
+        'prep_ms':   prep_ms,
+        'ocr_ms':    ocr_ms,
+        'agreement': similarity(raw_text, prep_text),
+        'raw_acc':   None,
+        'prep_acc':  None,
+    }
+
+    truth_path = os.path.splitext(path)[0] + '.txt'
+    if os.path.exists(truth_path):
+        with open(truth_path, encoding='utf-8') as fh:
+            truth = fh.read()
+        row['raw_acc'] = similarity(truth, raw_text)
+        row['prep_acc'] = similarity(truth, prep_text)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('corpus', help='directory of sample images')
+    parser.add_argument('--steps', default=OCR_PREPROCESS, help='preprocessing steps')
+    args = parser.parse_args()
+
+    files = sorted(
+        os.path.join(args.corpus, f) for f in os.listdir(args.corpus)
+        if f.lower().endswith(IMAGE_EXTS)
+    )
+    if not files:
+        raise SystemExit(f"No images found in {args.corpus}")
+
+    fmt = lambda v: '-' if v is None else f"{v:.2f}"
+    print(f"{'file':30} {'pixels':>11} {'raw ms':>9} {'prep ms':>9} {'ocr ms':>9} "
+          f"{'agree':>6} {'raw acc':>8} {'prep acc':>8}")
+
+    rows = [run(path, args.steps) for path in files]
+    for r in rows:
+        print(f"{r['file'][:30]:30} {r['pixels']:>11} {r['raw_ms']:9.1f} {r['prep_ms']:9.1f} "
+              f"{r['ocr_ms']:9.1f} {r['agreement']:6.2f} {fmt(r['raw_acc']):>8} {fmt(r['prep_acc']):>8}")
+
+    raw_total = sum(r['raw_ms'] for r in rows)
+    prep_total = sum(r['prep_ms'] + r['ocr_ms'] for r in rows)
+    print(f"\nmean per page: raw {raw_total / len(rows):.1f} ms, "
+          f"preprocessed {prep_total / len(rows):.1f} ms (incl. preprocessing)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# server/benchmarks/payloads.py
+"""
+Reports bytes on the wire and serialization time for representative API
+payloads: stdlib json as Flask's default provider configures it versus
+orjson, each raw, gzip'd and brotli'd.
+
+    cd server
+    python -m benchmarks.payloads [--reports 7] [--patients 500] [--runs 50]
+
+orjson and brotli columns are skipped when those packages are missing.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import string
+import time
+from datetime import date, timedelta
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# same levels app.py hands to Flask-Compress
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+COMPRESS_BR_LEVEL = int(os.getenv('COMPRESS_BR_LEVEL', 4))
+
+
+def words(rng, n):
+    return " ".join(
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(n)
+    )
+
+
+def dashboard_payload(rng, reports, points):
+    start = date(2022, 1, 1)
+    series = lambda lo, hi: [
+        {"date": (start + timedelta(days=7 * i)).isoformat(), "value": round(rng.uniform(lo, hi), 1)}
+        for i in range(points)
+    ]
+    return {
+        "health_summary": {"bloodpressure": "120/80", "oxygenlevel": 98, "sugarlevel": 95},
+        "health_trends": {
+            "blood_pressure": series(100, 150),
+            "oxygen_level": series(92, 100),
+            "sugar_level": series(70, 180),
+        },
+        "recommendations": [words(rng, 20) for _ in range(3)],
+        "medications": [{"medicationname": words(rng, 2), "dosage": "10mg", "frequency": "daily"} for _ in range(5)],
+        "reports": [
+            {"reportdate": (start + timedelta(days=30 * i)).isoformat(), "reportcontent": words(rng, 900)}
+            for i in range(reports)
+        ],
+    }
+
+
+def patients_payload(rng, count):
+    return [{
+        "id": f"{rng.getrandbits(128):032x}",
+        "name": words(rng, 2).title(),
+        "dob": date(1940 + rng.randint(0, 60), rng.randint(1, 12), rng.randint(1, 28)).isoformat(),
+        "email": f"{words(rng, 1)}@example.com",
+        "phone": f"555-{rng.randint(1000, 9999)}",
+        "address": words(rng, 6),
+        "preferredlanguage": rng.choice(["English", "Korean", "Spanish"]),
+    } for _ in range(count)]
+
+
+def stdlib_dumps(obj):
+    # what Flask's DefaultJSONProvider does for a compact response
+    return json.dumps(obj, sort_keys=True, ensure_ascii=True, separators=(",", ":")).encode("utf-8")
+
+
+def timed(fn, obj, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        body = fn(obj)
+        timings.append((time.perf_counter() - start) * 1000)
+    return body, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--reports', type=int, default=7)
+    parser.add_argument('--points', type=int, default=150)
+    parser.add_argument('--patients', type=int, default=500)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    payloads = {
+        'dashboard-data': dashboard_payload(rng, args.reports, args.points),
+        'api/patients': patients_payload(rng, args.patients),
+    }
+
+    encoders = [('json', stdlib_dumps)]
+    if orjson is not None:
+        encoders.append(('orjson', orjson.dumps))
+
+    print(f"{'payload':16} {'encoder':8} {'ms':>8} {'raw B':>10} {'gzip B':>10} {'br B':>10}")
+    for name, obj in payloads.items():
+        for label, fn in encoders:
+            body, ms = timed(fn, obj, args.runs)
+            gz = len(gzip.compress(body, COMPRESS_LEVEL))
+            br = len(brotli.compress(body, quality=COMPRESS_BR_LEVEL)) if brotli else None
+            print(f"{name:16} {label:8} {ms:8.3f} {len(body):>10,} {gz:>10,} "
+                  f"{'-' if br is None else f'{br:,}':>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# server/benchmarks/roster.py
+"""
+Compares /list-patients' old full visit scan against one roster page.
+
+    cd server
+    python -m benchmarks.roster [--visits 50000] [--patients 400] [--limit 50]
+    python -m benchmarks.roster --live <doctor_id>
+
+The synthetic mode replays PostgREST-shaped JSON payloads, so JSON decoding
+and the per-row aggregation are measured but the network is not. Payload
+sizes are reported alongside, since transfer time grows with them too.
+--live runs both paths against the configured Supabase project.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import types
+import uuid
+from datetime import datetime, timedelta
+
+from roster import _scan_page, roster_page
+
+
+class ReplayQuery:
+    """
+    Minimal stand-in for a PostgREST query builder that answers from a
+    pre-serialized payload per table.
+    """
+
+    def __init__(self, payloads, table):
+        self.payloads, self.table, self.in_ids = payloads, table, None
+
+    def select(self, *a, **k): return self
+    def eq(self, *a, **k): return self
+    def or_(self, *a, **k): return self
+    def order(self, *a, **k): return self
+    def limit(self, *a, **k): return self
+
+    def in_(self, column, values):
+        self.in_ids = set(values)
+        return self
+
+    def execute(self):
+        rows = json.loads(self.payloads[self.table])
+        if self.in_ids is not None:
+            rows = [r for r in rows if r['id'] in self.in_ids]
+        return types.SimpleNamespace(data=rows)
+
+
+class ReplayClient:
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    def table(self, name):
+        return ReplayQuery(self.payloads, name)
+
+
+def synthetic_payloads(visit_count, patient_count, limit):
+    rng = random.Random(0)
+    patients = [{'id': str(uuid.UUID(int=rng.getrandbits(128))), 'name': f"Patient {i}"}
+                for i in range(patient_count)]
+    start = datetime(2015, 1, 1)
+    visits = [
+        {'patient_id': rng.choice(patients)['id'],
+         'visitdate': (start + timedelta(minutes=rng.randrange(10 * 365 * 24 * 60))).isoformat()}
+        for _ in range(visit_count)
+    ]
+
+    roster = {}
+    for v in visits:
+        r = roster.setdefault(v['patient_id'], {'last_visit': v['visitdate'], 'visit_count': 0})
+        r['visit_count'] += 1
+        r['last_visit'] = max(r['last_visit'], v['visitdate'])
+    names = {p['id']: p['name'] for p in patients}
+    roster_rows = sorted(
+        ({'patient_id': pid, 'patient_name': names[pid], **r} for pid, r in roster.items()),
+        key=lambda r: (r['last_visit'], r['patient_id']), reverse=True
+    )[:limit + 1]
+
+    return {
+        'visits': json.dumps(visits),
+        'patients': json.dumps(patients),
+        'doctor_patient_roster': json.dumps(roster_rows),
+    }
+
+
+def timed(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--visits', type=int, default=50000)
+    parser.add_argument('--patients', type=int, default=400)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--live', metavar='DOCTOR_ID')
+    args = parser.parse_args()
+
+    if args.live:
+        from clients import get_supabase
+        client, doctor_id = get_supabase(), args.live
+        print(f"live doctor {doctor_id}")
+    else:
+        payloads = synthetic_payloads(args.visits, args.patients, args.limit)
+        client, doctor_id = ReplayClient(payloads), 'synthetic'
+        print(f"synthetic: {args.visits} visits over {args.patients} patients")
+        print(f"  payload  scan {len(payloads['visits']) + len(payloads['patients']):>12,} B   "
+              f"roster {len(payloads['doctor_patient_roster']):>10,} B")
+
+    scan_ms = timed(lambda: _scan_page(client, doctor_id, args.limit, None), args.runs)
+    roster_ms = timed(lambda: roster_page(client, doctor_id, args.limit, None), args.runs)
+    print(f"  median   scan {scan_ms:12.2f} ms   roster {roster_ms:10.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+# server/cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+MISSING = object()
+
+
+class MemoryBackend:
+    """
+    In-process LRU store. Entries expire after their TTL and the least
+    recently used entry is evicted once `max_entries` is exceeded.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (namespace, value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            namespace, value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None, namespace=None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (namespace, value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_namespace(self, namespace):
+        with self._lock:
+            stale = [k for k, (ns, _, _) in self._data.items() if ns == namespace]
+            for k in stale:
+                del self._data[k]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteBackend:
+    """
+    On-disk LRU store shared by every worker process pointing at the same
+    file. Values are stored as JSON text; with `max_bytes` the total size of
+    stored values is bounded as well as the entry count.
+
+    Entry count and byte total are kept in a one-row stats table by
+    triggers, so checking the limits on `set()` costs a single lookup.
+    Once over a limit, eviction frees down to 90% of it, and expired rows
+    are purged at most every `purge_interval` seconds.
+    """
+
+    LOW_WATER = 0.9
+
+    def __init__(self, path, max_entries=10000, table="cache_entries", max_bytes=None,
+                 purge_interval=60.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.table = table
+        self.purge_interval = purge_interval
+        self._purged_at = 0.0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                    key         TEXT PRIMARY KEY,
+                    namespace   TEXT,
+                    value       TEXT NOT NULL,
+                    expires_at  REAL,
+                    accessed_at REAL NOT NULL,
+                    size        INTEGER NOT NULL DEFAULT 0
+                )"""
+        )
+        columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+        if 'size' not in columns:
+            # file from before sizes were tracked
+            self._conn.execute(f"ALTER TABLE {table} ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute(f"UPDATE {table} SET size = LENGTH(value)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_ns ON {table} (namespace)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_lru ON {table} (accessed_at)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_exp ON {table} (expires_at)")
+
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table}_stats (
+                    id      INTEGER PRIMARY KEY CHECK (id = 0),
+                    entries INTEGER NOT NULL,
+                    bytes   INTEGER NOT NULL
+                )"""
+        )
+        self._conn.execute(
+            f"""INSERT OR IGNORE INTO {table}_stats (id, entries, bytes)
+                SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM {table}"""
+        )
+        self._conn.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_ins AFTER INSERT ON {table} BEGIN
+                    UPDATE {table}_stats SET entries = entries + 1, bytes = bytes + NEW.size;
+                END"""
+        )
+        self._conn.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_del AFTER DELETE ON {table} BEGIN
+                    UPDATE {table}_stats SET entries = entries - 1, bytes = bytes - OLD.size;
+                END"""
+        )
+        self._conn.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_upd AFTER UPDATE OF size ON {table} BEGIN
+                    UPDATE {table}_stats SET bytes = bytes - OLD.size + NEW.size;
+                END"""
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return MISSING
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                return MISSING
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None, namespace=None):
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        text = json.dumps(value)
+        with self._lock:
+            # an upsert rather than INSERT OR REPLACE: REPLACE deletes skip
+            # the delete trigger and would leave the stats off
+            self._conn.execute(
+                f"""INSERT INTO {self.table}
+                    (key, namespace, value, expires_at, accessed_at, size)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET
+                        namespace = excluded.namespace, value = excluded.value,
+                        expires_at = excluded.expires_at,
+                        accessed_at = excluded.accessed_at, size = excluded.size""",
+                (key, namespace, text, expires_at, now, len(text)),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        if now - self._purged_at >= self.purge_interval:
+            self._purged_at = now
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (now,),
+            )
+
+        entries, total = self._conn.execute(
+            f"SELECT entries, bytes FROM {self.table}_stats"
+        ).fetchone()
+        over_entries = entries > self.max_entries
+        over_bytes = bool(self.max_bytes) and total > self.max_bytes
+        if not (over_entries or over_bytes):
+            return
+
+        # walk the LRU index just far enough to get back under both limits
+        entry_target = int(self.max_entries * self.LOW_WATER) if over_entries else self.max_entries
+        byte_target = int(self.max_bytes * self.LOW_WATER) if over_bytes else self.max_bytes
+        stale = []
+        rows = self._conn.execute(
+            f"SELECT key, size FROM {self.table} ORDER BY accessed_at ASC"
+        )
+        for key, size in rows:
+            if entries <= entry_target and (not byte_target or total <= byte_target):
+                break
+            stale.append((key,))
+            entries -= 1
+            total -= size
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", stale)
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def delete_namespace(self, namespace):
+        with self._lock:
+            cur = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE namespace = ?", (namespace,)
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            (count,) = self._conn.execute(f"SELECT entries FROM {self.table}_stats").fetchone()
+        return count
+
+
+class _Flight:
+    """
+    Result slot shared by callers waiting on the same in-flight compute.
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+
+    def resolve(self, value):
+        self._value = value
+        self._done.set()
+
+    def fail(self, error):
+        self._error = error
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class TTLCache:
+    """
+    Cache front-end over a pluggable backend. Keys can be scoped to a
+    namespace (usually a patient id) so a whole patient's entries can be
+    invalidated at once. Hit/miss counters are reported via /api/metrics.
+    """
+
+    def __init__(self, name, backend, ttl=None):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}  # full key -> _Flight
+        metrics.register(f"cache.{name}", self.stats)
+
+    @staticmethod
+    def fingerprint(payload):
+        """
+        Stable SHA-256 content hash of any JSON-able payload.
+        """
+        raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _full_key(key, namespace):
+        return f"{namespace}:{key}" if namespace is not None else key
+
+    def get(self, key, namespace=None):
+        value = self.backend.get(self._full_key(key, namespace))
+        with self._lock:
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, namespace=None):
+        self.backend.set(self._full_key(key, namespace), value, self.ttl, namespace)
+
+    def get_or_compute(self, key, compute, namespace=None, cacheable=None):
+        """
+        Returns the cached value for `key`, or calls `compute()` and stores
+        its result. Results rejected by `cacheable(value)` are not stored.
+        Concurrent misses on the same key are coalesced (single flight):
+        only the first caller computes, the others wait for its result.
+        """
+        value = self.get(key, namespace)
+        if value is not MISSING:
+            return value
+
+        full_key = self._full_key(key, namespace)
+        with self._lock:
+            flight = self._in_flight.get(full_key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[full_key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return flight.wait()
+
+        try:
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self.set(key, value, namespace)
+            flight.resolve(value)
+            return value
+        except BaseException as e:
+            flight.fail(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(full_key, None)
+
+    def invalidate(self, namespace):
+        return self.backend.delete_namespace(namespace)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "backend":   type(self.backend).__name__,
+            "entries":   len(self.backend),
+            "hits":      hits,
+            "misses":    misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
+
+
+def build_cache(name, env_prefix, default_ttl=3600, default_max_entries=1024,
+                default_backend="memory", default_max_bytes=None):
+    """
+    Builds a TTLCache configured from environment variables:
+      {PREFIX}_BACKEND      "memory" or "sqlite"
+      {PREFIX}_TTL          seconds, 0 disables expiry
+      {PREFIX}_MAX_ENTRIES  LRU bound
+      {PREFIX}_MAX_BYTES    total value size bound (sqlite backend only)
+      {PREFIX}_PATH         SQLite file (sqlite backend only)
+    """
+    kind = os.getenv(f"{env_prefix}_BACKEND", default_backend).lower()
+    ttl = int(os.getenv(f"{env_prefix}_TTL", default_ttl)) or None
+    max_entries = int(os.getenv(f"{env_prefix}_MAX_ENTRIES", default_max_entries))
+    max_bytes = int(os.getenv(f"{env_prefix}_MAX_BYTES", default_max_bytes or 0)) or None
+
+    if kind == "sqlite":
+        path = os.getenv(f"{env_prefix}_PATH", os.path.join(".cache", f"{name}.sqlite3"))
+        backend = SQLiteBackend(path, max_entries=max_entries, max_bytes=max_bytes)
+    else:
+        backend = MemoryBackend(max_entries=max_entries)
+
+    return TTLCache(name, backend, ttl=ttl)
@@ -1,19 +1,47 @@
 # server/chat_routes.py
-from flask import Blueprint, request, jsonify
-import openai
-from supabase import create_client, Client
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import json
+import time
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+from metrics import LatencyHistogram
+from cache import build_cache, MISSING
+from invalidation import on_patient_change
+from prompt_builder import PromptBuilder, render_lines
+from query_executor import QueryBatch
+from conversation_memory import load_memory, schedule_refresh
+from clients import supabase, llm
+import patient_directory
+import metrics
+import appointment_summaries
 
 load_dotenv()
 
 # Setup
 chat_routes = Blueprint('chat_routes', __name__)
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# When true, /chat streams by default; either way a request can pass
+# {"stream": true|false} (or ?stream=1) to choose explicitly.
+CHAT_STREAMING_DEFAULT = os.getenv('CHAT_STREAMING_DEFAULT', 'false').lower() == 'true'
+
+CHAT_PROMPT_TOKEN_BUDGET = int(os.getenv('CHAT_PROMPT_TOKEN_BUDGET', 3000))
+CHAT_REPORT_TOKEN_CAP = int(os.getenv('CHAT_REPORT_TOKEN_CAP', 150))
+
+# Rendered patient-static prompt sections, reused across chat turns
+chat_context_cache = build_cache('chat_context', 'CHAT_CONTEXT_CACHE', default_ttl=600)
+
+@on_patient_change
+def _invalidate_chat_context(patient_id, source):
+    chat_context_cache.invalidate(patient_id)
+
+# Doctor-facing visit summaries, precomputed for upcoming appointments
+appointment_summaries.invalidate_on_change(supabase)
+appointment_summaries.start_scheduler(supabase, llm)  # no-op unless APPOINTMENT_PRECOMPUTE_SCHEDULER=true
+metrics.register('appointment_summaries', appointment_summaries.stats)
+
+chat_ttft = LatencyHistogram('chat.time_to_first_token')
+chat_latency = LatencyHistogram('chat.completion_latency')
 
 print(">>> Loaded OPENAI_API_KEY:", os.getenv("OPENAI_API_KEY"))  # 디버깅용, None 뜨면 아직 못 읽음
 
@@ -23,211 +51,260 @@ def get_current_user():
         return None
     return user_id
 
-# ─── 1. Chat Endpoint ────────────────────────────────────────────────────────
-@chat_routes.route('/chat', methods=['POST'])
-
-def chat_with_ai():
-    client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-    user_id = get_current_user()
-    data = request.get_json()
-    user_question = data.get('question')
-
-    if not user_id or not user_question:
-        return jsonify({"error": "Missing user_id or question"}), 400
-
-    # 1. basic info
-    patient_resp = supabase.table('patients').select('id, name, dob, preferredlanguage').eq('id', user_id).single().execute()
-    patient = patient_resp.data
-    if not patient:
-        return jsonify({"error": "Patient not found"}), 404
-
-    # 2. chat history
-    chat_resp = (
-        supabase
-        .table('chat_messages')
-        .select('sender, message')
-        .eq('patient_id', user_id)
-        .order('created_at')
-        .limit(10)
-        .execute()
-    )
-    chat_history = chat_resp.data or []
-
-    # 3. recent visits
-        # 3. past visits
-    past_visits_resp = (
-        supabase
-        .table('visits')
-        .select('visitdate, bloodpressure, oxygenlevel, sugarlevel, doctorrecommendation')
-        .eq('patient_id', user_id)
-        .lte('visitdate', datetime.utcnow().isoformat())  # visits in the past
-        .order('visitdate', desc=True)
-        .limit(3)
-        .execute()
-    )
-    past_visits = past_visits_resp.data or []
-
-    # 4. upcoming visits
-    upcoming_visits_resp = (
-        supabase
-        .table('visits')
-        .select('visitdate, doctorrecommendation')
-        .eq('patient_id', user_id)
-        .gt('visitdate', datetime.utcnow().isoformat())  # visits in the future
-        .order('visitdate')
-        .limit(3)
-        .execute()
-    )
-    upcoming_visits = upcoming_visits_resp.data or []
-
-    # 4. OCR reports
-    reports_resp = (
-        supabase
-        .table('reports')
-        .select('reportdate, reportcontent')
-        .eq('patient_id', user_id)
-        .order('reportdate', desc=True)
-        .limit(7)
-        .execute()
-    )
-    reports = reports_resp.data or []
-
-    # 5. Prompt
-    prompt = f"""
+CHAT_PREAMBLE = """
 You are a friendly and caring AI healthcare assistant.
 Always answer in the same language the user asks the question in.
 When you answer, ALWAYS consider the patient's own health history, doctor notes, and reports first.
 If the patient's health information does not mention any restrictions, you can say it seems fine based on available data, but kindly remind the patient that it is always best to double-check with their doctor.
 
 
-Patient Info:
-- Name: {patient['name']}
-- Date of Birth: {patient['dob']}
-- Preferred Language: {patient['preferredlanguage']}
-
-Recent Health Visits:
 """
 
+
+def load_chat_context(user_id):
+    """
+    Returns the patient-static prompt sections (patient info, past and
+    upcoming visits, OCR reports) as pre-rendered (text, tokens) lines, or
+    None if the patient does not exist. Cached per patient until the TTL
+    expires or the patient's visits/reports change.
+    """
+    cached = chat_context_cache.get('static', namespace=user_id)
+    if cached is not MISSING:
+        return cached
+
+    now_iso = datetime.utcnow().isoformat()
+    with QueryBatch('chat_context') as batch:
+        batch.submit('patient', patient_directory.get, supabase, user_id, ('id', 'name', 'dob', 'preferredlanguage'))
+
+        # past visits
+        batch.submit('past_visits', lambda: (
+            supabase
+            .table('visits')
+            .select('visitdate, bloodpressure, oxygenlevel, sugarlevel, doctorrecommendation')
+            .eq('patient_id', user_id)
+            .lte('visitdate', now_iso)  # visits in the past
+            .order('visitdate', desc=True)
+            .limit(3)
+            .execute()
+        ).data or [])
+
+        # upcoming visits
+        batch.submit('upcoming_visits', lambda: (
+            supabase
+            .table('visits')
+            .select('visitdate, doctorrecommendation')
+            .eq('patient_id', user_id)
+            .gt('visitdate', now_iso)  # visits in the future
+            .order('visitdate')
+            .limit(3)
+            .execute()
+        ).data or [])
+
+        # OCR reports
+        batch.submit('reports', lambda: (
+            supabase
+            .table('reports')
+            .select('reportdate, reportcontent')
+            .eq('patient_id', user_id)
+            .order('reportdate', desc=True)
+            .limit(7)
+            .execute()
+        ).data or [])
+
+        patient = batch.result('patient')
+        if not patient:
+            return None
+        past_visits = batch.result('past_visits')
+        upcoming_visits = batch.result('upcoming_visits')
+        reports = batch.result('reports')
+
+    visit_lines = []
     for v in past_visits:
-        prompt += f"\n• Visit on {v['visitdate']}:"
+        line = f"\n• Visit on {v['visitdate']}:"
         if v.get('bloodpressure'):
-            prompt += f" Blood pressure: {v['bloodpressure']}."
+            line += f" Blood pressure: {v['bloodpressure']}."
         if v.get('oxygenlevel'):
-            prompt += f" Oxygen level: {v['oxygenlevel']}%."
+            line += f" Oxygen level: {v['oxygenlevel']}%."
         if v.get('sugarlevel'):
-            prompt += f" Blood sugar: {v['sugarlevel']} mg/dL."
+            line += f" Blood sugar: {v['sugarlevel']} mg/dL."
         if v.get('doctorrecommendation'):
-            prompt += f" Doctor's recommendation: {v['doctorrecommendation']}."
+            line += f" Doctor's recommendation: {v['doctorrecommendation']}."
+        visit_lines.append(line)
 
-    prompt += "\n\nUpcoming Appointments:"
+    upcoming_lines = []
     for v in upcoming_visits:
-        prompt += f"\n• Scheduled for {v['visitdate']}:"
+        line = f"\n• Scheduled for {v['visitdate']}:"
         if v.get('doctorrecommendation'):
-            prompt += f" Planned: {v['doctorrecommendation']}."
-
-    prompt += "\n\nOCR Reports (uploaded health documents):"
-    for r in reports:
-        prompt += f"\n• {r['reportdate']}: {r['reportcontent'][:300]}..."
-
-    prompt += "\n\nRecent Chat History:\n"
-    for chat in chat_history:
-        role = "User" if chat['sender'] == 'user' else "AI"
-        prompt += f"\n{role}: {chat['message']}"
-
-    prompt += f"\n\nPatient's new question: {user_question}\n\nAnswer:"
-
-    # 6. OpenAI call
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "You are a warm and gentle medical assistant who explains health information in simple, caring words."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0
+            line += f" Planned: {v['doctorrecommendation']}."
+        upcoming_lines.append(line)
+
+    context = {
+        'patient': render_lines([
+            f"\n- Name: {patient['name']}",
+            f"\n- Date of Birth: {patient['dob']}",
+            f"\n- Preferred Language: {patient['preferredlanguage']}",
+        ]),
+        'past_visits': render_lines(visit_lines),
+        'upcoming_visits': render_lines(upcoming_lines),
+        'reports': render_lines(
+            [f"\n• {r['reportdate']}: {r['reportcontent'] or ''}" for r in reports],
+            token_cap=CHAT_REPORT_TOKEN_CAP
+        ),
+    }
+    chat_context_cache.set('static', context, namespace=user_id)
+    return context
+
+
+def build_chat_prompt(context, summary, chat_history, user_question):
+    """
+    Lays the sections out in the usual order. Under budget pressure the
+    question and patient info are kept first, then the newest chat turns,
+    the conversation summary, past visits, upcoming visits and finally
+    the reports.
+    """
+    history_lines = [
+        f"\n{'User' if chat['sender'] == 'user' else 'AI'}: {chat['message']}"
+        for chat in chat_history
+    ]
+
+    builder = (
+        PromptBuilder(CHAT_PROMPT_TOKEN_BUDGET)
+        .add(CHAT_PREAMBLE, [], priority=0)
+        .add("Patient Info:", context['patient'], priority=1)
+        .add("\n\nRecent Health Visits:\n", context['past_visits'], priority=4)
+        .add("\n\nUpcoming Appointments:", context['upcoming_visits'], priority=5)
+        .add("\n\nOCR Reports (uploaded health documents):", context['reports'], priority=6, truncate_last=True)
+        .add("\n\nEarlier Conversation Summary:\n", [summary] if summary else [], priority=3, truncate_last=True)
+        .add("\n\nRecent Chat History:\n", history_lines, priority=2, keep="tail")
+        .add(f"\n\nPatient's new question: {user_question}\n\nAnswer:", [], priority=0)
     )
+    prompt = builder.render()
+    return prompt
+
+
+# ─── 1. Chat Endpoint ────────────────────────────────────────────────────────
+@chat_routes.route('/chat', methods=['POST'])
+
+def chat_with_ai():
+    user_id = get_current_user()
+    data = request.get_json()
+    user_question = data.get('question')
+
+    if not user_id or not user_question:
+        return jsonify({"error": "Missing user_id or question"}), 400
+
+    # 1. patient info, visits and reports (cached between turns)
+    context = load_chat_context(user_id)
+    if context is None:
+        return jsonify({"error": "Patient not found"}), 404
+
+    # 2. rolling summary of older turns plus the newest raw turns
+    summary, chat_history = load_memory(supabase, user_id)
+
+    # 3. Prompt, filled by priority within the token budget
+    prompt = build_chat_prompt(context, summary, chat_history, user_question)
+
+    # 4. OpenAI call
+    messages = [
+        {"role": "system", "content": "You are a warm and gentle medical assistant who explains health information in simple, caring words."},
+        {"role": "user", "content": prompt}
+    ]
+
+    if wants_stream(data):
+        return Response(
+            stream_with_context(stream_answer(messages, user_id, user_question)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    with chat_latency.time() as timer:
+        response = llm.chat.completions.create(
+            model="gpt-4o",
+            messages=messages,
+            temperature=0
+        )
+    # without streaming the first token arrives with the whole answer
+    chat_ttft.observe(timer.elapsed_ms)
     answer = response.choices[0].message.content
 
-    # 7. save chat
+    # 5. save chat
+    save_chat_turn(user_id, user_question, answer)
+
+    return jsonify({"answer": answer}), 200
+
+
+def wants_stream(data):
+    flag = data.get('stream', request.args.get('stream'))
+    if flag is None:
+        return CHAT_STREAMING_DEFAULT
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+
+def save_chat_turn(user_id, user_question, answer):
     supabase.table('chat_messages').insert([
         {"patient_id": user_id, "sender": "user", "message": user_question},
         {"patient_id": user_id, "sender": "bot", "message": answer}
     ]).execute()
-
-    return jsonify({"answer": answer}), 200
+    schedule_refresh(supabase, llm, user_id)
+
+
+def sse(payload, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+
+def stream_answer(messages, user_id, user_question):
+    """
+    Yields Server-Sent Events: one `data: {"token": ...}` per delta, then
+    `event: done` with the full answer once it has been saved.
+    """
+    started = time.perf_counter()
+    ttft_ms = None
+    parts = []
+
+    try:
+        stream = llm.chat.completions.create(
+            model="gpt-4o",
+            messages=messages,
+            temperature=0,
+            stream=True
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+                chat_ttft.observe(ttft_ms)
+            parts.append(delta)
+            yield sse({"token": delta})
+    except Exception as e:
+        print('Error streaming chat:', e)
+        yield sse({"error": "Failed to generate answer"}, event="error")
+        return
+
+    chat_latency.observe((time.perf_counter() - started) * 1000)
+    answer = "".join(parts)
+
+    try:
+        save_chat_turn(user_id, user_question, answer)
+    except Exception as e:
+        print('Error saving chat:', e)
+
+    yield sse({
+        "answer":  answer,
+        "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None
+    }, event="done")
 
 
 
 # ─── 4) Appointment Summary  ────────────────────────────────────────
 @chat_routes.route('/appointment-summary/<patient_id>', methods=['GET'])
 def appointment_summary(patient_id):
-    #
-    client = openai.OpenAI(api_key=os.getenv('OPENAI_KEY'))
-
-    # 1) info
-    pr = supabase.table('patients') \
-        .select('name, dob, preferredlanguage') \
-        .eq('id', patient_id) \
-        .single() \
-        .execute()
-    patient = pr.data or {}
-    if not patient:
+    summary = appointment_summaries.get_summary(supabase, llm, patient_id)
+    if summary is None:
         return jsonify({'error':'Patient not found'}),404
 
-    # 2) recent visits
-    vr = supabase.table('visits') \
-        .select('visitdate, bloodpressure, oxygenlevel, sugarlevel, doctorrecommendation') \
-        .eq('patient_id', patient_id) \
-        .order('visitdate', desc=True) \
-        .limit(3) \
-        .execute()
-    visits = vr.data or []
-
-    # 3) recent reports
-    rr = supabase.table('reports') \
-        .select('reportdate, reportcontent') \
-        .eq('patient_id', patient_id) \
-        .order('reportdate', desc=True) \
-        .limit(3) \
-        .execute()
-    reports = rr.data or []
-
-    # 4) Prompt
-    prompt = f"""
-You are a concise and helpful AI medical assistant.
-
-Summarize the patient's recent health data to help the doctor prepare.
-Please output **only** the final summary line, formatted exactly like:
-Summary: summary text only
-
-Patient Info:
-- Name: {patient['name']}
-- DOB: {patient['dob']}
-- Preferred Language: {patient['preferredlanguage']}
-
-Recent Visits:
-"""
-    for v in visits:
-        prompt += f"\n• {v['visitdate']}: "
-        if v.get('bloodpressure'):      prompt += f"BP: {v['bloodpressure']}. "
-        if v.get('oxygenlevel'):       prompt += f"O₂: {v['oxygenlevel']}%. "
-        if v.get('sugarlevel'):        prompt += f"BG: {v['sugarlevel']} mg/dL. "
-        if v.get('doctorrecommendation'): prompt += f"Note: {v['doctorrecommendation']}."
-
-    prompt += "\n\nRecent Reports:"
-    for r in reports:
-        prompt += f"\n• {r['reportdate']}: {r['reportcontent'][:300]}..."
-
-    # 5) OpenAI 호출
-    res = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role":"system","content":"You are a concise and helpful AI medical assistant."},
-            {"role":"user","content":prompt}
-        ],
-        temperature=0
-    )
-    summary = res.choices[0].message.content
-
     return jsonify({"summary":summary}),200
-
-
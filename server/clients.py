@@ -0,0 +1,107 @@
+# server/clients.py
+import os
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv('SUPABASE_URL')
+# one key for the whole process; SUPABASE_KEY is honoured for older .env files
+SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_KEY')
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', 20))
+
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 120))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 2))
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', 50))
+OPENAI_MAX_KEEPALIVE = int(os.getenv('OPENAI_MAX_KEEPALIVE', 20))
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def _get(name, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def _build_supabase():
+    from supabase import create_client, ClientOptions
+
+    # server-side key: no user session to persist or refresh in the background
+    options = ClientOptions(
+        postgrest_client_timeout=SUPABASE_TIMEOUT,
+        storage_client_timeout=SUPABASE_TIMEOUT,
+        auto_refresh_token=False,
+        persist_session=False
+    )
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=options)
+
+
+def _build_openai():
+    import httpx
+    import openai
+
+    http_client = openai.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE
+        )
+    )
+    return openai.OpenAI(
+        api_key=OPENAI_API_KEY,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=http_client
+    )
+
+
+def get_supabase():
+    """
+    Process-wide Supabase client, built on first use.
+    """
+    return _get('supabase', _build_supabase)
+
+
+def auth_client():
+    """
+    A fresh Supabase client for `auth.*` calls (sign-in, sign-up). Signing
+    in switches a client's PostgREST and storage headers to the user's JWT,
+    so this must never be the shared data client, nor shared between
+    requests.
+    """
+    return _build_supabase()
+
+
+def get_openai():
+    """
+    Process-wide OpenAI client, built on first use. Its httpx pool keeps
+    connections alive across requests.
+    """
+    return _get('openai', _build_openai)
+
+
+class LazyClient:
+    """
+    Stands in for a client at module level and builds it on first
+    attribute access, so importing a module never opens connections.
+    """
+
+    def __init__(self, getter):
+        self._getter = getter
+
+    def __getattr__(self, name):
+        return getattr(self._getter(), name)
+
+    def __repr__(self):
+        return f"<LazyClient {self._getter.__name__}>"
+
+
+supabase = LazyClient(get_supabase)
+llm = LazyClient(get_openai)
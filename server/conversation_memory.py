@@ -0,0 +1,151 @@
+# server/conversation_memory.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from supabase import Client
+
+# Number of most recent raw messages sent with every prompt
+CHAT_RECENT_TURNS = int(os.getenv('CHAT_RECENT_TURNS', 10))
+# Fold older messages into the summary once this many have accumulated
+CHAT_SUMMARY_EVERY = int(os.getenv('CHAT_SUMMARY_EVERY', 10))
+# At most this many of the oldest unsummarized messages go into one fold;
+# a longer backlog is caught up over the following refreshes
+CHAT_SUMMARY_MAX_FOLD = int(os.getenv('CHAT_SUMMARY_MAX_FOLD', 50))
+CHAT_SUMMARY_MODEL = os.getenv('CHAT_SUMMARY_MODEL', 'gpt-4o-mini')
+
+_summarizer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='chat-summary')
+_in_flight = set()
+_lock = threading.Lock()
+
+
+def load_memory(supabase: Client, patient_id):
+    """
+    Returns (summary, recent_messages): the rolling summary of older turns
+    (empty string if none yet) and the newest CHAT_RECENT_TURNS messages,
+    oldest first.
+    """
+    try:
+        summary_rows = (
+            supabase
+            .table('chat_summaries')
+            .select('summary')
+            .eq('patient_id', patient_id)
+            .limit(1)
+            .execute()
+        ).data or []
+    except Exception as e:
+        # a missing side table should not take the chat down
+        print('Error loading chat summary:', e)
+        summary_rows = []
+
+    recent = (
+        supabase
+        .table('chat_messages')
+        .select('sender, message, created_at')
+        .eq('patient_id', patient_id)
+        .order('created_at', desc=True)
+        .limit(CHAT_RECENT_TURNS)
+        .execute()
+    ).data or []
+    recent.reverse()
+
+    summary = summary_rows[0]['summary'] if summary_rows else ''
+    return summary, recent
+
+
+def schedule_refresh(supabase: Client, llm, patient_id):
+    """
+    Refreshes the patient's summary in the background. At most one
+    refresh per patient runs at a time.
+    """
+    with _lock:
+        if patient_id in _in_flight:
+            return
+        _in_flight.add(patient_id)
+
+    def _run():
+        try:
+            refresh_summary(supabase, llm, patient_id)
+        except Exception as e:
+            print(f"Chat summary refresh failed for {patient_id}:", e)
+        finally:
+            with _lock:
+                _in_flight.discard(patient_id)
+
+    _summarizer.submit(_run)
+
+
+def refresh_summary(supabase: Client, llm, patient_id):
+    """
+    Folds messages older than the last CHAT_RECENT_TURNS (and newer than
+    what the summary already covers) into the stored summary, once at
+    least CHAT_SUMMARY_EVERY such messages exist. Only the oldest
+    CHAT_SUMMARY_MAX_FOLD are folded per call, so the prompt stays bounded.
+    """
+    rows = (
+        supabase
+        .table('chat_summaries')
+        .select('summary, summarized_through')
+        .eq('patient_id', patient_id)
+        .limit(1)
+        .execute()
+    ).data or []
+    summary = rows[0]['summary'] if rows else ''
+    summarized_through = rows[0]['summarized_through'] if rows else None
+
+    query = (
+        supabase
+        .table('chat_messages')
+        .select('sender, message, created_at')
+        .eq('patient_id', patient_id)
+    )
+    if summarized_through:
+        query = query.gt('created_at', summarized_through)
+    # with more rows than this, the oldest CHAT_SUMMARY_MAX_FOLD are
+    # certainly outside the recent window, so the rest need not be read
+    pending = (
+        query
+        .order('created_at')
+        .limit(CHAT_SUMMARY_MAX_FOLD + CHAT_RECENT_TURNS)
+        .execute()
+    ).data or []
+
+    # the newest turns are still sent verbatim, so leave them out. A
+    # user/bot pair shares one created_at, so never cut between the two.
+    cut = len(pending) - CHAT_RECENT_TURNS
+    while 0 < cut < len(pending) and pending[cut - 1]['created_at'] == pending[cut]['created_at']:
+        cut -= 1
+    to_fold = pending[:max(cut, 0)]
+    if len(to_fold) < CHAT_SUMMARY_EVERY:
+        return False
+
+    transcript = "\n".join(
+        f"{'User' if m['sender'] == 'user' else 'AI'}: {m['message']}"
+        for m in to_fold
+    )
+    prompt = (
+        "Update the running summary of a patient's conversation with a healthcare assistant.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\n"
+        f"New messages:\n{transcript}\n\n"
+        "Return only the updated summary in at most 150 words. Keep health concerns, "
+        "symptoms, medications, advice already given and open questions; drop small talk."
+    )
+    resp = llm.chat.completions.create(
+        model=CHAT_SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a concise clinical note taker."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0
+    )
+    new_summary = resp.choices[0].message.content.strip()
+
+    supabase.table('chat_summaries').upsert({
+        'patient_id':         patient_id,
+        'summary':            new_summary,
+        'summarized_through': to_fold[-1]['created_at'],
+        'updated_at':         datetime.utcnow().isoformat()
+    }).execute()
+    return True
@@ -1,13 +1,33 @@
 import io
 import os
+import threading
 from openai import OpenAI
 from datetime import datetime
 from supabase import Client
 from dotenv import load_dotenv
+from PIL import Image, ImageOps
+from query_executor import QueryBatch
+import metrics
 
 
 load_dotenv()
 
+# The vision model downsizes anything larger than this, so sending more
+# pixels only costs upload time and tokens.
+VISION_MAX_EDGE = int(os.getenv('VISION_MAX_EDGE', 1568))
+THUMBNAIL_EDGE = int(os.getenv('THUMBNAIL_EDGE', 256))
+DERIVATIVE_QUALITY = int(os.getenv('DERIVATIVE_QUALITY', 85))
+
+_stats_lock = threading.Lock()
+_image_stats = {
+    "images":               0,
+    "original_bytes":       0,
+    "vision_bytes":         0,
+    "thumbnail_bytes":      0,
+    "vision_prompt_tokens": 0,
+}
+metrics.register('image_ingest', lambda: dict(_image_stats))
+
 def upload_image_to_supabase(
     supabase: Client,
     bucket_name: str,
@@ -25,13 +45,82 @@ def upload_image_to_supabase(
     file_obj.stream.seek(0)
     data: bytes = file_obj.read()
 
-    # Upload
+    return _upload(supabase, bucket_name, path, data, file_obj.mimetype)
+
+def _upload(supabase: Client, bucket_name: str, path: str, data: bytes, mimetype: str) -> str:
     supabase.storage.from_(bucket_name).upload(
         file         = data,
         path         = path,
-        file_options = {"content-type": file_obj.mimetype}
+        file_options = {"content-type": mimetype}
     )
 
     # Get public URL
     public_url: str = supabase.storage.from_(bucket_name).get_public_url(path)
-    return public_url
\ No newline at end of file
+    return public_url
+
+def make_derivative(data: bytes, max_edge: int, quality: int = DERIVATIVE_QUALITY) -> bytes:
+    """
+    Re-encodes an image as a JPEG whose longest edge is at most `max_edge`.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+def upload_image_set(
+    supabase: Client,
+    bucket_name: str,
+    file_obj
+) -> dict:
+    """
+    Stores the original upload plus two derivatives: a size-bounded JPEG
+    for the vision model and a small thumbnail for report lists. The three
+    uploads run concurrently. Returns their public URLs and byte sizes.
+    """
+    ts      = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    safe_fn = file_obj.filename.replace(" ", "_")
+
+    file_obj.stream.seek(0)
+    original: bytes = file_obj.read()
+    vision = make_derivative(original, VISION_MAX_EDGE)
+    thumbnail = make_derivative(original, THUMBNAIL_EDGE, quality=75)
+
+    with QueryBatch("image_upload") as batch:
+        batch.submit("original", _upload, supabase, bucket_name,
+                     f"originals/{ts}_{safe_fn}", original, file_obj.mimetype)
+        batch.submit("vision", _upload, supabase, bucket_name,
+                     f"vision/{ts}_{safe_fn}.jpg", vision, "image/jpeg")
+        batch.submit("thumbnail", _upload, supabase, bucket_name,
+                     f"thumbnails/{ts}_{safe_fn}.jpg", thumbnail, "image/jpeg")
+        urls = {name: batch.result(name) for name in ("original", "vision", "thumbnail")}
+
+    with _stats_lock:
+        _image_stats["images"] += 1
+        _image_stats["original_bytes"] += len(original)
+        _image_stats["vision_bytes"] += len(vision)
+        _image_stats["thumbnail_bytes"] += len(thumbnail)
+
+    return {
+        "original_url":    urls["original"],
+        "vision_url":      urls["vision"],
+        "thumbnail_url":   urls["thumbnail"],
+        "original_bytes":  len(original),
+        "vision_bytes":    len(vision),
+    }
+
+def record_vision_usage(prompt_tokens: int):
+    with _stats_lock:
+        _image_stats["vision_prompt_tokens"] += prompt_tokens or 0
+
+def thumbnail_url_for(image_url):
+    """
+    Thumbnail URL for an original stored by upload_image_set, or None for
+    images uploaded before thumbnails existed.
+    """
+    if not image_url or "/originals/" not in image_url:
+        return None
+    base = image_url.split("?", 1)[0]
+    head, _, tail = base.rpartition("/originals/")
+    return f"{head}/thumbnails/{tail}.jpg"
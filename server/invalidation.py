@@ -0,0 +1,34 @@
+# server/invalidation.py
+import threading
+
+_lock = threading.Lock()
+_subscribers = []
+
+
+def on_patient_change(callback):
+    """
+    Subscribes `callback(patient_id, source)` to patient data changes.
+    Can be used as a decorator.
+    """
+    with _lock:
+        _subscribers.append(callback)
+    return callback
+
+
+def patient_changed(patient_id, source=None):
+    """
+    Notifies every subscriber that data for `patient_id` was written.
+    `source` names the table that changed (e.g. "visits", "reports").
+    Subscriber errors are logged, never raised into the request.
+    """
+    if not patient_id:
+        return
+
+    with _lock:
+        subscribers = list(_subscribers)
+
+    for callback in subscribers:
+        try:
+            callback(patient_id, source)
+        except Exception as e:
+            print(f"Invalidation callback failed for {patient_id}:", e)
@@ -0,0 +1,258 @@
+# server/job_queue.py
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+TERMINAL_STATES = ('done', 'failed')
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    Durable background job queue backed by a local SQLite file.
+
+    Routes enqueue work with `enqueue(kind, payload, blob)` and return the
+    job id immediately; a pool of worker threads runs the handler
+    registered for `kind` as `handler(payload, blob) -> dict`. The result
+    (or error) is stored on the job row and can be read with `get()` or
+    long-polled with `wait()`.
+
+    Each claimed job records its owner (pid plus a per-instance token) and
+    a lease deadline. Running jobs are only handed to another worker once
+    the owning process is gone or, as a last resort, the lease has run out,
+    so several processes can share one queue file.
+    """
+
+    def __init__(self, path, workers=2, poll_interval=1.0, lease=3600.0):
+        self.path = path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self._handlers = {}
+        self._threads = []
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                   id          TEXT PRIMARY KEY,
+                   kind        TEXT NOT NULL,
+                   status      TEXT NOT NULL,
+                   payload     TEXT NOT NULL,
+                   blob        BLOB,
+                   result      TEXT,
+                   error       TEXT,
+                   created_at  REAL NOT NULL,
+                   updated_at  REAL NOT NULL
+               )"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if 'owner' not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        if 'lease_until' not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at)")
+        self._conn.commit()
+
+        # jobs orphaned by a dead process, or simply still queued, get
+        # workers without waiting for the next enqueue()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._reclaim_stale()
+            pending = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+            ).fetchone()[0]
+            self._conn.commit()
+        # a forkserver/spawn child re-imports the app's main module; only the
+        # real app process runs jobs
+        if pending and multiprocessing.current_process().name == 'MainProcess':
+            self.start()
+
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+        # queued jobs of this kind may have been waiting for their handler
+        with self._cond:
+            self._cond.notify_all()
+        return handler
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def enqueue(self, kind, payload, blob=None):
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO jobs (id, kind, status, payload, blob, created_at, updated_at)
+                   VALUES (?, ?, 'queued', ?, ?, ?, ?)""",
+                (job_id, kind, json.dumps(payload), blob, now, now)
+            )
+            self._conn.commit()
+
+        self.start()
+        with self._cond:
+            self._cond.notify_all()
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                """SELECT id, kind, status, payload, result, error, created_at, updated_at
+                   FROM jobs WHERE id = ?""",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, kind, status, payload, result, error, created_at, updated_at = row
+        return {
+            'id':         job_id,
+            'kind':       kind,
+            'status':     status,
+            'payload':    json.loads(payload),
+            'result':     json.loads(result) if result else None,
+            'error':      error,
+            'created_at': created_at,
+            'updated_at': updated_at,
+        }
+
+    def wait(self, job_id, timeout):
+        """
+        Long-poll: returns the job once it is done/failed or after `timeout`
+        seconds, whichever comes first.
+        """
+        deadline = time.time() + timeout
+        job = self.get(job_id)
+        while job is not None and job['status'] not in TERMINAL_STATES:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            with self._cond:
+                self._cond.wait(min(remaining, self.poll_interval))
+            job = self.get(job_id)
+        return job
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return {'workers': self.workers, **{status: count for status, count in rows}}
+
+    # ── worker side ───────────────────────────────────────────────────────
+    def _is_stale(self, owner, lease_until, now):
+        if not owner or lease_until is None or lease_until < now:
+            return True
+        pid, _, _ = owner.partition(':')
+        if int(pid) == os.getpid():
+            # same pid, different token: an earlier incarnation of this process
+            return owner != self._owner
+        return not _pid_alive(int(pid))
+
+    def _reclaim_stale(self):
+        """
+        Puts running jobs whose owner is gone back in the queue. The caller
+        holds the write transaction.
+        """
+        now = time.time()
+        running = self._conn.execute(
+            "SELECT id, owner, lease_until FROM jobs WHERE status = 'running'"
+        ).fetchall()
+        for job_id, owner, lease_until in running:
+            if self._is_stale(owner, lease_until, now):
+                self._conn.execute(
+                    """UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL,
+                              updated_at = ? WHERE id = ?""",
+                    (now, job_id)
+                )
+
+    def _claim(self):
+        kinds = list(self._handlers)
+        if not kinds:
+            return None
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            self._reclaim_stale()
+            # only kinds this process can run; others stay queued for a process that can
+            row = cur.execute(
+                f"""SELECT id, kind, payload, blob FROM jobs
+                    WHERE status = 'queued' AND kind IN ({','.join('?' * len(kinds))})
+                    ORDER BY created_at LIMIT 1""",
+                kinds
+            ).fetchone()
+            if row is None:
+                self._conn.commit()
+                return None
+            now = time.time()
+            cur.execute(
+                """UPDATE jobs SET status = 'running', owner = ?, lease_until = ?,
+                          updated_at = ? WHERE id = ?""",
+                (self._owner, now + self.lease, now, row[0])
+            )
+            self._conn.commit()
+        return row
+
+    def _finish(self, job_id, result=None, error=None):
+        status = 'failed' if error is not None else 'done'
+        with self._lock:
+            # the uploaded bytes are no longer needed once the job has run
+            self._conn.execute(
+                """UPDATE jobs SET status = ?, result = ?, error = ?, blob = NULL,
+                          lease_until = NULL, updated_at = ? WHERE id = ?""",
+                (status, json.dumps(result) if result is not None else None,
+                 error, time.time(), job_id)
+            )
+            self._conn.commit()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+            except Exception as e:
+                print('Job claim failed:', e)
+                job = None
+
+            if job is None:
+                with self._cond:
+                    self._cond.wait(self.poll_interval)
+                continue
+
+            job_id, kind, payload, blob = job
+            started = time.perf_counter()
+            try:
+                result = self._handlers[kind](json.loads(payload), blob)
+                self._finish(job_id, result=result)
+            except Exception as e:
+                print(f"Job {job_id} ({kind}) failed:", e)
+                self._finish(job_id, error=str(e))
+            print(f"Job {job_id} ({kind}) finished in {(time.perf_counter() - started) * 1000:.1f}ms")
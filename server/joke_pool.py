@@ -0,0 +1,139 @@
+# server/joke_pool.py
+import atexit
+import json
+import os
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+JOKE_POOL_SIZE = int(os.getenv('JOKE_POOL_SIZE', 30))
+JOKE_POOL_LOW_WATER = int(os.getenv('JOKE_POOL_LOW_WATER', 10))
+JOKE_POOL_PATH = os.getenv('JOKE_POOL_PATH', os.path.join('.cache', 'jokes.json'))
+JOKE_MODEL = os.getenv('JOKE_MODEL', 'gpt-4o')
+
+SYSTEM_PROMPT = (
+    "You are a dad joke generator specializing in health and wellness topics. "
+    "Always respond with short, funny, light-hearted jokes related to health, medicine, or fitness."
+)
+
+# Served only while the pool is empty and the first batch is being generated
+FALLBACK_JOKES = (
+    "Why did the cookie go to the doctor? Because it felt crummy.",
+    "I told my doctor I broke my arm in two places. He told me to stop going to those places.",
+    "Why did the banana go to the doctor? It wasn't peeling well.",
+    "What did one eye say to the other? Between you and me, something smells.",
+)
+
+
+class JokePool:
+    """
+    Buffer of pre-generated jokes. take() pops one in O(1); when the
+    buffer drops below `low_water` a single background call generates a
+    fresh batch. The buffer is saved to `path` after each refill and at
+    exit, so restarts start warm without a disk write per request.
+    """
+
+    def __init__(self, llm, size=JOKE_POOL_SIZE, low_water=JOKE_POOL_LOW_WATER,
+                 path=JOKE_POOL_PATH, model=JOKE_MODEL):
+        self.llm = llm
+        self.size = size
+        self.low_water = low_water
+        self.path = path
+        self.model = model
+        self._jokes = deque(self._load())
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._refilling = False
+        self._refiller = ThreadPoolExecutor(max_workers=1, thread_name_prefix='joke-pool')
+        self._stats = {"served": 0, "fallbacks": 0, "refills": 0, "refill_errors": 0}
+        metrics.register('joke_pool', self.stats)
+        atexit.register(self._save)
+
+    def take(self):
+        with self._lock:
+            joke = self._jokes.popleft() if self._jokes else None
+            if joke is None:
+                self._stats["fallbacks"] += 1
+            else:
+                self._stats["served"] += 1
+            remaining = len(self._jokes)
+        self._maybe_refill(remaining)
+        if joke is None:
+            return random.choice(FALLBACK_JOKES)
+        return joke
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "buffered": len(self._jokes), "refilling": self._refilling}
+
+    def _maybe_refill(self, remaining):
+        if remaining >= self.low_water:
+            return
+        with self._lock:
+            if self._refilling:
+                return
+            self._refilling = True
+        self._refiller.submit(self._refill)
+
+    def _refill(self):
+        try:
+            fresh = self._generate(self.size)
+            with self._lock:
+                seen = set(self._jokes)
+                for joke in fresh:
+                    if joke not in seen and len(self._jokes) < self.size:
+                        self._jokes.append(joke)
+                        seen.add(joke)
+                self._stats["refills"] += 1
+            self._save()
+        except Exception as e:
+            print('Joke pool refill failed:', e)
+            with self._lock:
+                self._stats["refill_errors"] += 1
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def _generate(self, count):
+        """
+        One LLM call returning a JSON list of `count` distinct jokes.
+        """
+        response = self.llm.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": f'Write {count} different random health-related dad jokes. '
+                               'Reply with JSON: {"jokes": ["...", "..."]}'
+                }
+            ],
+            temperature=0.8,
+            response_format={"type": "json_object"}
+        )
+        jokes = json.loads(response.choices[0].message.content).get("jokes", [])
+        return [j.strip() for j in jokes if isinstance(j, str) and j.strip()]
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as fh:
+                return [j for j in json.load(fh) if isinstance(j, str)]
+        except (OSError, ValueError):
+            return []
+
+    def _save(self):
+        # snapshot under the save lock so the last write is always the newest
+        with self._save_lock:
+            with self._lock:
+                jokes = list(self._jokes)
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, 'w', encoding='utf-8') as fh:
+                    json.dump(jokes, fh)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print('Joke pool save failed:', e)
@@ -0,0 +1,39 @@
+# server/json_provider.py
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson. Keys keep insertion order instead
+    of being sorted; dates and anything else orjson cannot encode natively
+    go through Flask's default() so the wire format stays the same.
+    """
+
+    sort_keys = False
+    _OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def _encode(self, obj, indent=None):
+        option = self._OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        return self._encode(obj, kwargs.get('indent')).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(
+            self._encode(obj, indent=2 if pretty else None) + b"\n",
+            mimetype=self.mimetype
+        )
+
+
+JSONProvider = OrjsonProvider if orjson is not None else DefaultJSONProvider
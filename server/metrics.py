@@ -0,0 +1,102 @@
+# server/metrics.py
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+_lock = threading.Lock()
+_providers = {}
+
+
+def register(name, provider):
+    """
+    Registers a zero-argument callable whose return value (a JSON-able dict)
+    is reported under `name` by the /api/metrics endpoint.
+    """
+    with _lock:
+        _providers[name] = provider
+    return provider
+
+
+def snapshot():
+    """
+    Collects the current value of every registered provider.
+    """
+    with _lock:
+        providers = dict(_providers)
+
+    result = {}
+    for name, provider in providers.items():
+        try:
+            result[name] = provider()
+        except Exception as e:
+            print(f"Metrics provider '{name}' failed:", e)
+            result[name] = {"error": str(e)}
+    return result
+
+
+class LatencyHistogram:
+    """
+    Millisecond histogram with fixed upper bucket bounds, plus
+    percentiles over a window of the most recent samples.
+    """
+
+    DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self, name, buckets=DEFAULT_BUCKETS, window=1024):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._recent = deque(maxlen=window)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+        register(name, self.snapshot)
+
+    def observe(self, ms):
+        with self._lock:
+            self._counts[bisect_left(self.buckets, ms)] += 1
+            self._recent.append(ms)
+            self._count += 1
+            self._sum += ms
+
+    def time(self):
+        """
+        Context manager recording the wall time of its block.
+        """
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            recent = sorted(self._recent)
+            count, total = self._count, self._sum
+
+        def pct(p):
+            if not recent:
+                return None
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))], 2)
+
+        labels = [f"le_{b}" for b in self.buckets] + ["le_inf"]
+        return {
+            "count":   count,
+            "mean_ms": round(total / count, 2) if count else None,
+            "p50_ms":  pct(0.50),
+            "p95_ms":  pct(0.95),
+            "p99_ms":  pct(0.99),
+            "buckets": dict(zip(labels, counts)),
+        }
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed_ms = (time.perf_counter() - self.start) * 1000
+        self.histogram.observe(self.elapsed_ms)
+        return False
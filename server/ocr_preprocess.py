@@ -0,0 +1,118 @@
+# server/ocr_preprocess.py
+import os
+
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+
+# Comma-separated pipeline; set OCR_PREPROCESS=off to hand Tesseract the raw image
+OCR_PREPROCESS = os.getenv('OCR_PREPROCESS', 'resize,grayscale,threshold,deskew,crop')
+OCR_MAX_SIDE = int(os.getenv('OCR_MAX_SIDE', 2500))
+OCR_MIN_SIDE = int(os.getenv('OCR_MIN_SIDE', 1000))
+
+
+def normalize_resolution(img, max_side=OCR_MAX_SIDE, min_side=OCR_MIN_SIDE):
+    """
+    Scales the longest side into [min_side, max_side], roughly 300 DPI for
+    a letter-size page. Large phone photos shrink; thumbnails grow.
+    """
+    longest = max(img.size)
+    if longest > max_side:
+        scale = max_side / longest
+    elif longest < min_side:
+        scale = min_side / longest
+    else:
+        return img
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.LANCZOS)
+
+
+def to_grayscale(img):
+    # honour camera orientation before dropping colour
+    return ImageOps.exif_transpose(img).convert('L')
+
+
+def adaptive_threshold(img, block=31, offset=10):
+    """
+    Local-mean binarization: a pixel is ink when it is more than `offset`
+    darker than the mean of its `block`-sized neighbourhood. Handles
+    uneven lighting in photos far better than a global threshold.
+    """
+    gray = img.convert('L')
+    local_mean = gray.filter(ImageFilter.BoxBlur(block // 2))
+    darkness = ImageChops.subtract(local_mean, gray)  # max(mean - pixel, 0)
+    return darkness.point(lambda v: 0 if v > offset else 255)
+
+
+def _row_profile_score(img):
+    # variance of per-row ink density; sharpest when text lines are level
+    rows = list(img.resize((1, img.height), Image.BOX).getdata())
+    mean = sum(rows) / len(rows)
+    return sum((r - mean) ** 2 for r in rows) / len(rows)
+
+
+def estimate_skew(img, max_angle=5.0, step=0.5, probe_width=800):
+    """
+    Projection-profile skew estimate in degrees, searched on a small copy.
+    """
+    probe = img.convert('L')
+    if probe.width > probe_width:
+        probe = probe.resize(
+            (probe_width, max(1, round(probe.height * probe_width / probe.width))),
+            Image.BILINEAR
+        )
+
+    best_angle, best_score = 0.0, -1.0
+    steps = int(max_angle / step)
+    for i in range(-steps, steps + 1):
+        angle = i * step
+        rotated = probe.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor='white')
+        score = _row_profile_score(rotated)
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def deskew(img, max_angle=5.0, step=0.5):
+    angle = estimate_skew(img, max_angle, step)
+    if angle == 0:
+        return img
+    return img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor='white')
+
+
+def crop_to_text(img, margin=20):
+    """
+    Crops a binarized page to the bounding box of its ink plus `margin`.
+    """
+    bbox = ImageOps.invert(img.convert('L')).getbbox()
+    if not bbox:
+        return img
+    left, top, right, bottom = bbox
+    return img.crop((
+        max(0, left - margin),
+        max(0, top - margin),
+        min(img.width, right + margin),
+        min(img.height, bottom + margin),
+    ))
+
+
+STEPS = {
+    'resize':    normalize_resolution,
+    'grayscale': to_grayscale,
+    'threshold': adaptive_threshold,
+    'deskew':    deskew,
+    'crop':      crop_to_text,
+}
+
+
+def preprocess(img, steps=None):
+    """
+    Runs the configured steps (OCR_PREPROCESS by default) in order.
+    """
+    steps = OCR_PREPROCESS if steps is None else steps
+    if isinstance(steps, str):
+        if steps.strip().lower() in ('', 'off', 'none'):
+            return img
+        steps = [s.strip() for s in steps.split(',') if s.strip()]
+
+    for name in steps:
+        img = STEPS[name](img)
+    return img
@@ -0,0 +1,170 @@
+# server/ocr_service.py
+import hashlib
+import io
+import multiprocessing
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib.machinery import ModuleSpec
+
+from PIL import Image
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+
+from cache import build_cache, MISSING
+from ocr_preprocess import OCR_PREPROCESS
+from ocr_worker import ocr_image
+
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', os.cpu_count() or 1))
+OCR_PDF_DPI = int(os.getenv('OCR_PDF_DPI', 200))
+
+# Text per document and per rasterized page, keyed on content hashes
+ocr_cache = build_cache(
+    'ocr',
+    'OCR_CACHE',
+    default_ttl=90 * 24 * 3600,
+    default_max_entries=50000,
+    default_backend='sqlite',
+    default_max_bytes=100 * 1024 * 1024
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+_submit_lock = threading.Lock()
+
+
+def get_ocr_pool():
+    """
+    Process pool for Tesseract, created on first use and sized to the
+    available cores (OCR_WORKERS). Workers come from a forkserver rather
+    than fork(), which is unsafe once the app has started threads.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['ocr_worker'])
+            _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=context)
+        return _pool
+
+
+def _reset_ocr_pool(broken):
+    """
+    Replaces a pool that lost a worker (e.g. OOM-killed on a huge page);
+    a broken ProcessPoolExecutor refuses all further work.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            print('OCR pool broke, rebuilding it')
+            _pool = None
+            broken.shutdown(wait=False, cancel_futures=True)
+    return get_ocr_pool()
+
+
+def _submit(pool, fn, *args):
+    """
+    pool.submit() without the worker re-importing the app. Workers are
+    started inside submit(), and a child normally re-runs the parent's
+    __main__ module (app.py) first; multiprocessing skips that when the
+    main module's spec is named '__main__'.
+    """
+    main = sys.modules['__main__']
+    with _submit_lock:
+        saved = getattr(main, '__spec__', None)
+        main.__spec__ = ModuleSpec('__main__', None)
+        try:
+            return pool.submit(fn, *args)
+        finally:
+            main.__spec__ = saved
+
+
+def iter_pdf_pages(data: bytes, dpi: int = OCR_PDF_DPI):
+    """
+    Rasterizes a PDF lazily, one page at a time, so only the pages being
+    OCR'd are held in memory.
+    """
+    page_count = pdfinfo_from_bytes(data)['Pages']
+    for page_no in range(1, page_count + 1):
+        yield convert_from_bytes(data, dpi=dpi, first_page=page_no, last_page=page_no)[0]
+
+
+def content_key(*parts) -> str:
+    """
+    SHA-256 over the given byte strings plus the OCR settings, so changing
+    the DPI or preprocessing pipeline never serves stale text.
+    """
+    digest = hashlib.sha256(f"{OCR_PDF_DPI}|{OCR_PREPROCESS}".encode("utf-8"))
+    for part in parts:
+        digest.update(b"\0")
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def page_key(page: Image.Image) -> str:
+    return content_key(f"{page.mode}|{page.size}".encode("utf-8"), page.tobytes())
+
+
+def ocr_pages(pages, workers: int = OCR_WORKERS):
+    """
+    OCRs an iterable of page images across the process pool and yields
+    the text of each page in order. Pages seen before are served from the
+    page cache, so a re-uploaded document that differs in a few pages only
+    OCRs those. At most `workers + 1` pages are in flight, which bounds
+    peak memory regardless of document length. If the pool breaks, it is
+    rebuilt and each affected page is retried once.
+    """
+    in_flight = deque()  # (key, page, pool, cached text or future)
+
+    def _settle(key, page, pool, pending):
+        if isinstance(pending, str):
+            return pending
+        try:
+            text = pending.result()
+        except BrokenProcessPool:
+            # other pages from the same broken pool land here too; only the
+            # first one replaces it
+            pool = _reset_ocr_pool(pool)
+            text = _submit(pool, ocr_image, page).result()
+        ocr_cache.set(key, text, namespace='page')
+        return text
+
+    for page in pages:
+        key = page_key(page)
+        cached = ocr_cache.get(key, namespace='page')
+        if cached is not MISSING:
+            in_flight.append((key, page, None, cached))
+        else:
+            pool = get_ocr_pool()
+            in_flight.append((key, page, pool, _submit(pool, ocr_image, page)))
+        if len(in_flight) > workers:
+            yield _settle(*in_flight.popleft())
+
+    while in_flight:
+        yield _settle(*in_flight.popleft())
+
+
+def document_key(data: bytes) -> str:
+    return content_key(data)
+
+
+def ocr_document(data: bytes, ext: str) -> str:
+    """
+    Extracts text from a PDF (page-parallel) or a single image upload.
+    Identical documents are answered from the cache without OCR.
+    """
+    return ocr_cache.get_or_compute(
+        document_key(data),
+        lambda: _ocr_document(data, ext),
+        namespace='doc'
+    )
+
+
+def _ocr_document(data: bytes, ext: str) -> str:
+    if ext == ".pdf":
+        return "".join(ocr_pages(iter_pdf_pages(data)))
+
+    with Image.open(io.BytesIO(data)) as img:
+        return ocr_image(img)
@@ -0,0 +1,18 @@
+# server/ocr_worker.py
+"""
+Code that runs inside OCR worker processes. Kept free of app, cache and
+client imports so a worker only loads Pillow, pytesseract and the
+preprocessing pipeline.
+"""
+import pytesseract
+from PIL import Image
+
+from ocr_preprocess import preprocess
+
+
+def ocr_image(image: Image.Image, steps=None) -> str:
+    """
+    Preprocesses and OCRs a single page. Module-level so it can run in a
+    worker process, where the preprocessing cost is parallelized too.
+    """
+    return pytesseract.image_to_string(preprocess(image, steps))
@@ -0,0 +1,109 @@
+# server/pagination.py
+import base64
+import json
+import os
+
+PAGE_DEFAULT_LIMIT = int(os.getenv('PAGE_DEFAULT_LIMIT', 50))
+PAGE_MAX_LIMIT = int(os.getenv('PAGE_MAX_LIMIT', 200))
+
+# Response header carrying the token for the following page (absent on the last page)
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(*values):
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size=2):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise CursorError("Malformed cursor") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise CursorError("Malformed cursor")
+    # (sort value, id): a timestamp or name, then an integer or string id.
+    # Anything else would reach the PostgREST filter or a tuple comparison.
+    *keys, tiebreak = values
+    if not all(isinstance(v, str) for v in keys):
+        raise CursorError("Malformed cursor")
+    if isinstance(tiebreak, bool) or not isinstance(tiebreak, (int, str)):
+        raise CursorError("Malformed cursor")
+    return values
+
+
+def page_args(args):
+    """
+    Reads `limit` and `cursor` from a request's query string. Returns
+    (limit, cursor values or None); raises CursorError on bad input.
+    """
+    try:
+        limit = int(args.get('limit', PAGE_DEFAULT_LIMIT))
+    except ValueError as e:
+        raise CursorError("limit must be an integer") from e
+    if limit < 1:
+        raise CursorError("limit must be positive")
+    token = args.get('cursor')
+    return min(limit, PAGE_MAX_LIMIT), (decode_cursor(token) if token else None)
+
+
+def _quote(value):
+    # PostgREST filter values with reserved characters must be double-quoted
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def keyset_page(query, column, tiebreak, limit, cursor, desc=False):
+    """
+    Runs `query` ordered by (column, tiebreak) and returns (rows, next
+    cursor). Rows come strictly after `cursor`, so pages stay stable while
+    rows are inserted and cost the same however deep they are.
+    """
+    op = 'lt' if desc else 'gt'
+    if cursor is not None:
+        value, key = cursor
+        query = query.or_(
+            f"{column}.{op}.{_quote(value)},"
+            f"and({column}.eq.{_quote(value)},{tiebreak}.{op}.{_quote(key)})"
+        )
+    rows = (
+        query
+        .order(column, desc=desc)
+        .order(tiebreak, desc=desc)
+        .limit(limit + 1)
+        .execute()
+    ).data or []
+    return _split(rows, limit, lambda r: (r[column], r[tiebreak]))
+
+
+def keyset_page_rows(rows, key, limit, cursor, desc=False):
+    """
+    Same contract as keyset_page for rows already in memory. `key(row)`
+    returns the (sort value, tiebreak) pair.
+    """
+    rows = sorted(rows, key=key, reverse=desc)
+    if cursor is not None:
+        bound = tuple(cursor)
+        rows = [r for r in rows if (key(r) < bound if desc else key(r) > bound)]
+    return _split(rows, limit, key)
+
+
+def _split(rows, limit, key):
+    # one extra row was fetched to learn whether another page exists
+    page = rows[:limit]
+    if len(rows) > limit and page:
+        return page, encode_cursor(*key(page[-1]))
+    return page, None
+
+
+def with_next_cursor(response, next_cursor):
+    """
+    Attaches the next-page token to a Response.
+    """
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
@@ -0,0 +1,93 @@
+# server/patient_directory.py
+from supabase import Client
+
+from cache import build_cache, MISSING
+from invalidation import on_patient_change
+
+# Every column any endpoint reads; callers project with `fields`
+PATIENT_COLUMNS = 'id, name, dob, email, phone, address, preferredlanguage'
+
+# Patient rows change rarely; PATIENT_CACHE_BACKEND=sqlite shares the
+# cache between worker processes on one host
+patient_cache = build_cache(
+    'patients',
+    'PATIENT_CACHE',
+    default_ttl=600,
+    default_max_entries=10000
+)
+
+
+@on_patient_change
+def _invalidate_patient(patient_id, source):
+    if source in (None, 'patients'):
+        patient_cache.invalidate(patient_id)
+
+
+def _project(record, fields):
+    # always a copy, so callers cannot mutate the cached record
+    if record is None:
+        return None
+    if fields is None:
+        return dict(record)
+    return {f: record.get(f) for f in fields}
+
+
+def _fetch_one(supabase: Client, patient_id):
+    rows = (
+        supabase
+        .table('patients')
+        .select(PATIENT_COLUMNS)
+        .eq('id', patient_id)
+        .limit(1)
+        .execute()
+    ).data
+    return rows[0] if rows else None
+
+
+def get(supabase: Client, patient_id, fields=None):
+    """
+    The patient's record (restricted to `fields` if given), or None if
+    there is no such patient. Concurrent misses share one query.
+    """
+    record = patient_cache.get_or_compute(
+        'record',
+        lambda: _fetch_one(supabase, patient_id),
+        namespace=patient_id,
+        cacheable=lambda r: r is not None
+    )
+    return _project(record, fields)
+
+
+def get_many(supabase: Client, patient_ids, fields=None):
+    """
+    {patient_id: record} for the ids that exist. Cached records are served
+    directly; all misses are fetched with a single `in_` query.
+    """
+    found, missing = {}, []
+    for pid in dict.fromkeys(patient_ids):
+        record = patient_cache.get('record', namespace=pid)
+        if record is MISSING:
+            missing.append(pid)
+        else:
+            found[pid] = record
+
+    if missing:
+        rows = (
+            supabase
+            .table('patients')
+            .select(PATIENT_COLUMNS)
+            .in_('id', missing)
+            .execute()
+        ).data or []
+        for row in rows:
+            patient_cache.set('record', row, namespace=row['id'])
+            found[row['id']] = row
+
+    return {pid: _project(r, fields) for pid, r in found.items()}
+
+
+def names(supabase: Client, patient_ids):
+    """
+    {patient_id: name} for the given ids.
+    """
+    return {pid: r['name'] for pid, r in get_many(supabase, patient_ids).items()}
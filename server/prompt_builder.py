@@ -0,0 +1,110 @@
+# server/prompt_builder.py
+import math
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o family
+except Exception:  # tiktoken is optional
+    _encoding = None
+
+
+def count_tokens(text):
+    """
+    Token count for gpt-4o prompts. Falls back to ~4 characters per token
+    when tiktoken is not installed.
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def truncate_to_tokens(text, max_tokens, suffix="..."):
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        return _encoding.decode(tokens[:max_tokens]) + suffix
+    return text[:max_tokens * 4] + suffix
+
+
+def render_lines(lines, token_cap=None):
+    """
+    Pre-renders section lines as (text, tokens) pairs so they can be cached
+    and re-used across prompts without re-tokenizing.
+    """
+    rendered = []
+    for line in lines:
+        if token_cap is not None:
+            line = truncate_to_tokens(line, token_cap)
+        rendered.append((line, count_tokens(line)))
+    return rendered
+
+
+class PromptBuilder:
+    """
+    Assembles a prompt from sections against a token budget.
+
+    Sections are emitted in the order they were added but filled in
+    priority order (lower number first), so when the budget runs out the
+    least important lines are the ones dropped. `keep="tail"` drops the
+    oldest lines of a section first (useful for chat history);
+    `truncate_last=True` cuts the first line that does not fit instead of
+    dropping it.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self._sections = []
+        self.used_tokens = 0
+
+    def add(self, header, lines, priority=0, keep="head", truncate_last=False):
+        """
+        `lines` is a list of strings or of (text, tokens) pairs from
+        render_lines().
+        """
+        pairs = [
+            tuple(l) if isinstance(l, (tuple, list)) else (l, count_tokens(l))
+            for l in lines
+        ]
+        self._sections.append({
+            "header":        header,
+            "header_tokens": count_tokens(header),
+            "lines":         pairs,
+            "priority":      priority,
+            "keep":          keep,
+            "truncate_last": truncate_last,
+        })
+        return self
+
+    def render(self):
+        remaining = self.budget
+        chosen = {}
+
+        for idx in sorted(range(len(self._sections)), key=lambda i: self._sections[i]["priority"]):
+            section = self._sections[idx]
+            remaining -= section["header_tokens"]
+
+            lines = section["lines"]
+            order = range(len(lines) - 1, -1, -1) if section["keep"] == "tail" else range(len(lines))
+            picked = {}
+            for i in order:
+                text, tokens = lines[i]
+                if tokens <= remaining:
+                    picked[i] = text
+                    remaining -= tokens
+                    continue
+                if section["truncate_last"] and remaining > 0:
+                    picked[i] = truncate_to_tokens(text, remaining)
+                    remaining = 0
+                break
+            chosen[idx] = [picked[i] for i in sorted(picked)]
+
+        self.used_tokens = self.budget - remaining
+        return "".join(
+            section["header"] + "".join(chosen[idx])
+            for idx, section in enumerate(self._sections)
+        )
@@ -0,0 +1,131 @@
+# server/query_executor.py
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+# Shared, bounded pool so concurrent requests cannot open unbounded
+# connections to Supabase / OpenAI.
+_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv('QUERY_POOL_SIZE', 16)),
+    thread_name_prefix='query'
+)
+
+
+# Separate, smaller pool for OpenAI calls (completions, Whisper), so a
+# burst of slow model requests cannot starve the database reads above
+_llm_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv('LLM_POOL_SIZE', 4)),
+    thread_name_prefix='llm'
+)
+
+
+def get_pool():
+    return _pool
+
+
+def get_llm_pool():
+    return _llm_pool
+
+
+class QueryBatch:
+    """
+    Request-scoped fan-out of independent reads onto the shared pool.
+
+        with QueryBatch('dashboard_data') as batch:
+            batch.submit('meds', lambda: ...)
+            batch.then('recs', 'visits', lambda visits: ..., pool=get_llm_pool())
+            meds = batch.result('meds')
+
+    Tasks run on the shared query pool unless `pool` names another
+    executor; model calls belong on get_llm_pool().
+
+    Each task's wall time is logged, together with the total batch time,
+    so it is easy to check that latency tracks the slowest query.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self._futures = {}
+        # pool tasks started by then(), so __exit__ can cancel them as well
+        self._inner = []
+        self._timings = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def _timed(self, name, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._timings[name] = elapsed
+
+    def submit(self, name, fn, *args, pool=None):
+        """
+        Schedules `fn(*args)` and registers its future under `name`.
+        """
+        future = (pool or _pool).submit(self._timed, name, fn, *args)
+        self._futures[name] = future
+        return future
+
+    def then(self, name, after, fn, pool=None):
+        """
+        Schedules `fn(result_of_after)` as soon as the task `after` has
+        finished, without blocking a pool thread while waiting.
+        """
+        chained = Future()
+        self._futures[name] = chained
+
+        def _finish(task):
+            if task.cancelled():
+                chained.set_exception(CancelledError())
+            elif task.exception() is not None:
+                chained.set_exception(task.exception())
+            else:
+                chained.set_result(task.result())
+
+        def _start(dep):
+            # a cancelled dependency cancels this task too
+            if dep.cancelled():
+                chained.cancel()
+            # False when the batch was cancelled (e.g. the view aborted) before
+            # the dependency finished: nothing to run, nothing to resolve
+            if not chained.set_running_or_notify_cancel():
+                return
+            if dep.exception() is not None:
+                chained.set_exception(dep.exception())
+                return
+            task = (pool or _pool).submit(self._timed, name, fn, dep.result())
+            with self._lock:
+                self._inner.append(task)
+            task.add_done_callback(_finish)
+
+        self._futures[after].add_done_callback(_start)
+        return chained
+
+    def result(self, name, timeout=None):
+        return self._futures[name].result(timeout=timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            with self._lock:
+                inner = list(self._inner)
+            for future in list(self._futures.values()) + inner:
+                future.cancel()
+        self.log_timings()
+        return False
+
+    def log_timings(self):
+        total = (time.perf_counter() - self._started) * 1000
+        with self._lock:
+            timings = dict(self._timings)
+        if not timings:
+            return
+        slowest = max(timings, key=timings.get)
+        parts = ", ".join(f"{name}={ms:.1f}ms" for name, ms in timings.items())
+        print(f"[{self.label}] total={total:.1f}ms slowest={slowest} ({timings[slowest]:.1f}ms) | {parts}")
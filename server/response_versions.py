@@ -0,0 +1,119 @@
+# server/response_versions.py
+import functools
+import os
+import uuid
+
+from flask import Response, g, make_response, request
+from supabase import Client
+
+from cache import build_cache, TTLCache
+from invalidation import on_patient_change
+from query_executor import QueryBatch
+
+RESPONSE_CACHE_CONTROL = os.getenv('RESPONSE_CACHE_CONTROL', 'private, no-cache')
+# Also fold per-table row counts into the version, so inserts and deletes
+# made outside this app change the ETag too
+RESPONSE_VERSION_COUNTS = os.getenv('RESPONSE_VERSION_COUNTS', 'true').lower() == 'true'
+
+# Per-patient random token, replaced on every change signal. Kept in a
+# SQLite file by default so every worker sees the same token and a write
+# handled by one worker changes the ETag served by all of them. The TTL
+# bounds how long a missed signal (a direct DB edit) can keep a stale
+# ETag alive.
+version_cache = build_cache(
+    'response_versions',
+    'RESPONSE_VERSION_CACHE',
+    default_ttl=300,
+    default_max_entries=10000,
+    default_backend='sqlite'
+)
+
+
+@on_patient_change
+def _bump_version(patient_id, source):
+    version_cache.invalidate(patient_id)
+
+
+def _row_count(supabase: Client, table, patient_id):
+    return (
+        supabase
+        .table(table)
+        .select('*', count='exact', head=True)
+        .eq('patient_id', patient_id)
+        .execute()
+    ).count
+
+
+def patient_version(supabase: Client, patient_id, tables=()):
+    """
+    Cheap version of everything stored for a patient: the change token
+    plus, when enabled, row counts of `tables` fetched in parallel.
+    """
+    token = version_cache.get_or_compute('token', lambda: uuid.uuid4().hex, namespace=patient_id)
+    if not (RESPONSE_VERSION_COUNTS and tables):
+        return [token]
+
+    with QueryBatch('response_version') as batch:
+        for table in tables:
+            batch.submit(table, _row_count, supabase, table, patient_id)
+        return [token] + [batch.result(table) for table in tables]
+
+
+def skip_etag():
+    """
+    Called from a view serving a degraded payload (e.g. a fallback
+    recommendation): the response goes out without an ETag and with
+    no-store, so the client asks again instead of revalidating it.
+    """
+    g.skip_etag = True
+
+
+# Flask-Compress appends ":<encoding>" to the ETag of compressed bodies
+_ENCODING_SUFFIXES = ('', ':br', ':gzip', ':deflate', ':zstd')
+
+
+def _matches(etag):
+    return any(request.if_none_match.contains_weak(etag + suffix) for suffix in _ENCODING_SUFFIXES)
+
+
+def conditional(version):
+    """
+    Decorator for GET views. `version(**view_args)` returns a JSON-able
+    version of the data behind the response, or None to skip versioning
+    (e.g. unauthenticated requests). A matching If-None-Match is answered
+    with 304 before the view runs; 200 responses carry a weak ETag.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                parts = version(**kwargs)
+            except Exception as e:
+                print('Response version lookup failed:', e)
+                parts = None
+            if parts is None:
+                return view(*args, **kwargs)
+
+            etag = TTLCache.fingerprint([
+                request.path,
+                sorted(request.args.items(multi=True)),
+                request.headers.get('Authorization'),
+                parts
+            ])[:32]
+
+            if _matches(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if g.pop('skip_etag', False):
+                    response.headers['Cache-Control'] = 'no-store'
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = RESPONSE_CACHE_CONTROL
+            response.vary.add('Authorization')
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,68 @@
+# server/roster.py
+from supabase import Client
+
+from pagination import keyset_page, keyset_page_rows
+import patient_directory
+
+
+def roster_page(supabase: Client, doctor_id, limit, cursor):
+    """
+    One page of a doctor's patients, most recently seen first, as
+    ([{patient_id, name, last_visit, visit_count}], next cursor).
+
+    Reads the trigger-maintained doctor_patient_roster table (see
+    sql/doctor_patient_roster.sql) in a single indexed query. If that table
+    is not there yet, falls back to aggregating the doctor's visit rows.
+    """
+    try:
+        query = (
+            supabase
+            .table('doctor_patient_roster')
+            .select('patient_id, patient_name, last_visit, visit_count')
+            .eq('doctor_id', doctor_id)
+        )
+        rows, next_cursor = keyset_page(query, 'last_visit', 'patient_id', limit, cursor, desc=True)
+    except Exception as e:
+        print('Roster read failed, scanning visits instead:', e)
+        return _scan_page(supabase, doctor_id, limit, cursor)
+
+    return [
+        {
+            'patient_id':  r['patient_id'],
+            'name':        r['patient_name'],
+            'last_visit':  r['last_visit'],
+            'visit_count': r['visit_count'],
+        }
+        for r in rows
+    ], next_cursor
+
+
+def _scan_page(supabase: Client, doctor_id, limit, cursor):
+    visits = (
+        supabase
+        .table('visits')
+        .select('patient_id, visitdate')
+        .eq('doctor_id', doctor_id)
+        .execute()
+    ).data or []
+
+    roster = {}
+    for v in visits:
+        entry = roster.setdefault(v['patient_id'], {'last_visit': v['visitdate'], 'visit_count': 0})
+        entry['visit_count'] += 1
+        if v['visitdate'] > entry['last_visit']:
+            entry['last_visit'] = v['visitdate']
+    if not roster:
+        return [], None
+
+    page, next_cursor = keyset_page_rows(
+        roster.items(), lambda kv: (kv[1]['last_visit'], kv[0]), limit, cursor, desc=True
+    )
+
+    name_map = patient_directory.names(supabase, [pid for pid, _ in page])
+
+    return [
+        {'patient_id': pid, 'name': name_map[pid], **entry}
+        for pid, entry in page
+        if pid in name_map
+    ], next_cursor
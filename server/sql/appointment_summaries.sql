@@ -0,0 +1,10 @@
+-- Doctor-facing pre-visit summaries maintained by appointment_summaries.py
+create table if not exists appointment_summaries (
+    patient_id    uuid primary key references patients(id) on delete cascade,
+    summary       text not null,
+    generated_at  timestamptz not null default now()
+);
+
+-- precompute scans open visits by date
+create index if not exists visits_status_visitdate_idx
+    on visits (status, visitdate);
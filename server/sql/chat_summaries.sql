@@ -0,0 +1,10 @@
+-- Rolling per-patient conversation summary maintained by conversation_memory.py
+create table if not exists chat_summaries (
+    patient_id          uuid primary key references patients(id) on delete cascade,
+    summary             text not null default '',
+    summarized_through  timestamptz,
+    updated_at          timestamptz not null default now()
+);
+
+create index if not exists chat_messages_patient_created_idx
+    on chat_messages (patient_id, created_at desc);
@@ -0,0 +1,104 @@
+-- One row per (doctor, patient) with the aggregates /list-patients needs.
+-- Kept current by triggers on visits and patients; read by roster.py.
+create table if not exists doctor_patient_roster (
+    doctor_id     uuid not null,
+    patient_id    uuid not null references patients(id) on delete cascade,
+    patient_name  text,
+    last_visit    timestamptz,
+    visit_count   integer not null default 0,
+    updated_at    timestamptz not null default now(),
+    primary key (doctor_id, patient_id)
+);
+
+-- keyset order used by the endpoint
+create index if not exists doctor_patient_roster_page_idx
+    on doctor_patient_roster (doctor_id, last_visit desc, patient_id desc);
+
+-- lets the trigger re-aggregate one pair without scanning the doctor's history
+create index if not exists visits_doctor_patient_visitdate_idx
+    on visits (doctor_id, patient_id, visitdate);
+
+
+create or replace function refresh_roster_pair(p_doctor uuid, p_patient uuid)
+returns void language plpgsql as $$
+declare
+    v_last  timestamptz;
+    v_count integer;
+begin
+    if p_doctor is null or p_patient is null then
+        return;
+    end if;
+
+    select max(visitdate), count(*) into v_last, v_count
+      from visits
+     where doctor_id = p_doctor and patient_id = p_patient;
+
+    if v_count = 0 then
+        delete from doctor_patient_roster
+         where doctor_id = p_doctor and patient_id = p_patient;
+        return;
+    end if;
+
+    insert into doctor_patient_roster (doctor_id, patient_id, patient_name, last_visit, visit_count, updated_at)
+    select p_doctor, p_patient, p.name, v_last, v_count, now()
+      from patients p
+     where p.id = p_patient
+    on conflict (doctor_id, patient_id) do update
+       set patient_name = excluded.patient_name,
+           last_visit   = excluded.last_visit,
+           visit_count  = excluded.visit_count,
+           updated_at   = now();
+end;
+$$;
+
+
+create or replace function visits_roster_trigger()
+returns trigger language plpgsql as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform refresh_roster_pair(old.doctor_id, old.patient_id);
+    end if;
+    if tg_op = 'INSERT'
+       or (tg_op = 'UPDATE'
+           and (new.doctor_id, new.patient_id) is distinct from (old.doctor_id, old.patient_id)) then
+        perform refresh_roster_pair(new.doctor_id, new.patient_id);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists visits_roster on visits;
+create trigger visits_roster
+    after insert or delete or update of doctor_id, patient_id, visitdate on visits
+    for each row execute function visits_roster_trigger();
+
+
+create or replace function patients_roster_trigger()
+returns trigger language plpgsql as $$
+begin
+    update doctor_patient_roster
+       set patient_name = new.name, updated_at = now()
+     where patient_id = new.id;
+    return null;
+end;
+$$;
+
+drop trigger if exists patients_roster on patients;
+create trigger patients_roster
+    after update of name on patients
+    for each row when (new.name is distinct from old.name)
+    execute function patients_roster_trigger();
+
+
+-- backfill existing history (safe to re-run)
+insert into doctor_patient_roster (doctor_id, patient_id, patient_name, last_visit, visit_count)
+select v.doctor_id, v.patient_id, p.name, max(v.visitdate), count(*)
+  from visits v
+  join patients p on p.id = v.patient_id
+ where v.doctor_id is not null
+ group by v.doctor_id, v.patient_id, p.name
+on conflict (doctor_id, patient_id) do update
+   set patient_name = excluded.patient_name,
+       last_visit   = excluded.last_visit,
+       visit_count  = excluded.visit_count,
+       updated_at   = now();
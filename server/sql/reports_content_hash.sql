@@ -0,0 +1,6 @@
+-- Upload dedupe matches on a hash of the uploaded file (ocr_service.document_key)
+-- instead of comparing the full OCR text in a URL filter
+alter table reports add column if not exists content_hash text;
+
+create index if not exists reports_patient_content_hash_idx
+    on reports (patient_id, content_hash);
@@ -0,0 +1,3 @@
+-- Supports keyset pagination of a doctor's visit lists (pagination.py)
+create index if not exists visits_doctor_status_visitdate_id_idx
+    on visits (doctor_id, status, visitdate, id);
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# server modules are imported top-level, as app.py does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,138 @@
+import math
+
+import pytest
+
+from vitals_calculator import (
+    annotate_visits,
+    bmi,
+    bmi_category,
+    body_surface_area,
+    derive_metrics,
+    mean_arterial_pressure,
+    parse_blood_pressure,
+    pulse_pressure,
+    to_float,
+)
+
+
+@pytest.mark.parametrize('value, expected', [
+    (72, 72.0),
+    (72.5, 72.5),
+    ("72", 72.0),
+    ("72.5 kg", 72.5),
+    ("  170cm", 170.0),
+])
+def test_to_float_parses_numbers_and_units(value, expected):
+    assert to_float(value) == expected
+
+
+@pytest.mark.parametrize('value', [
+    None, True, False, "", "abc", 0, "0", -70, "-70", "-70 kg", math.inf, math.nan, "nan",
+])
+def test_to_float_rejects_missing_non_positive_and_non_finite(value):
+    assert to_float(value) is None
+
+
+def test_to_float_bounds_are_inclusive():
+    assert to_float("30", (30, 300)) == 30.0
+    assert to_float("300", (30, 300)) == 300.0
+    assert to_float("29.9", (30, 300)) is None
+    assert to_float("300.1", (30, 300)) is None
+
+
+def test_bmi():
+    assert bmi(70, 170) == 24.2
+    assert bmi("70 kg", "170 cm") == 24.2
+    assert bmi("50", "180") == 15.4
+
+
+@pytest.mark.parametrize('weight, height', [
+    ("-70", "170"),    # sign must not be dropped
+    ("70", "-170"),
+    ("70kg", "1.7m"),  # height in metres
+    ("70000", "170"),  # grams
+    (None, "170"),
+    ("70", None),
+    ("heavy", "tall"),
+])
+def test_bmi_rejects_malformed_input(weight, height):
+    assert bmi(weight, height) is None
+
+
+@pytest.mark.parametrize('value, category', [
+    (10.0, "Underweight"),
+    (18.4, "Underweight"),
+    (18.5, "Normal weight"),
+    (24.9, "Normal weight"),
+    (25.0, "Overweight"),
+    (29.9, "Overweight"),
+    (30.0, "Obesity"),
+    (55.0, "Obesity"),
+    (None, None),
+])
+def test_bmi_category_boundaries(value, category):
+    assert bmi_category(value) == category
+
+
+def test_body_surface_area():
+    assert body_surface_area(70, 170) == 1.82
+    assert body_surface_area("80 kg", "180 cm") == 2.0
+    assert body_surface_area("-70", "170") is None
+    assert body_surface_area("70", "1.7") is None
+
+
+@pytest.mark.parametrize('value, expected', [
+    ("120/80", (120.0, 80.0)),
+    (" 135 / 85 mmHg", (135.0, 85.0)),
+    ("120.5/80.5", (120.5, 80.5)),
+])
+def test_parse_blood_pressure(value, expected):
+    assert parse_blood_pressure(value) == expected
+
+
+@pytest.mark.parametrize('value', [
+    None, 120, "", "120", "120-80", "80/120", "120/120", "-120/80", "1200/80", "40/30", "310/90",
+])
+def test_parse_blood_pressure_rejects_malformed(value):
+    assert parse_blood_pressure(value) is None
+
+
+def test_mean_arterial_pressure():
+    assert mean_arterial_pressure("120/80") == 93.3
+    assert mean_arterial_pressure("90/60") == 70.0
+    assert mean_arterial_pressure("garbage") is None
+
+
+def test_pulse_pressure():
+    assert pulse_pressure("120/80") == 40.0
+    assert pulse_pressure("140/90") == 50.0
+    assert pulse_pressure("80/120") is None
+
+
+def test_derive_metrics():
+    assert derive_metrics({'weight': "70", 'height': "170", 'bloodpressure': "120/80"}) == {
+        'bmi':                    24.2,
+        'bmi_category':           "Normal weight",
+        'body_surface_area':      1.82,
+        'mean_arterial_pressure': 93.3,
+        'pulse_pressure':         40.0,
+    }
+
+
+def test_derive_metrics_with_missing_inputs():
+    assert derive_metrics({}) == {
+        'bmi':                    None,
+        'bmi_category':           None,
+        'body_surface_area':      None,
+        'mean_arterial_pressure': None,
+        'pulse_pressure':         None,
+    }
+
+
+def test_annotate_visits_keeps_rows():
+    visits = [{'id': 1, 'weight': "70", 'height': "170"}, {'id': 2}]
+    annotated = annotate_visits(visits)
+    assert [v['id'] for v in annotated] == [1, 2]
+    assert annotated[0]['derived']['bmi'] == 24.2
+    assert annotated[1]['derived']['bmi'] is None
+    assert 'derived' not in visits[0]
@@ -0,0 +1,155 @@
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+import wolfram_service
+from wolfram_service import (
+    FALLBACK_ANSWER,
+    CircuitBreaker,
+    CircuitOpenError,
+    QueryNotUnderstood,
+    WolframClient,
+    WolframError,
+)
+
+BASE_URL = 'https://wolfram.test/v1/result'
+
+
+class ScriptedAdapter(BaseAdapter):
+    """
+    Transport adapter that answers each request with the next scripted
+    outcome: an int status code (body "answer <n>") or an exception.
+    """
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        outcome = self.script.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response._content = f"answer {self.calls}".encode()
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep(monkeypatch):
+    monkeypatch.setattr(wolfram_service.time, 'sleep', lambda seconds: None)
+
+
+def make_client(script, retries=2, breaker=None):
+    client = WolframClient(app_id='test', base_url=BASE_URL, retries=retries, breaker=breaker)
+    adapter = ScriptedAdapter(script)
+    client.session.mount('https://', adapter)
+    return client, adapter
+
+
+def test_success_closes_breaker():
+    client, adapter = make_client([200])
+    assert client.result('2+2') == 'answer 1'
+    assert adapter.calls == 1
+    assert client.breaker.snapshot() == {'state': 'closed', 'consecutive_failures': 0}
+
+
+@pytest.mark.parametrize('transient', [
+    503,
+    429,
+    requests.ConnectionError('reset'),
+    requests.Timeout('slow'),
+    requests.exceptions.ChunkedEncodingError('truncated'),
+])
+def test_retries_then_succeeds(transient):
+    client, adapter = make_client([transient, transient, 200])
+    assert client.result('2+2') == 'answer 3'
+    assert adapter.calls == 3
+    assert client.breaker.state == 'closed'
+
+
+def test_gives_up_after_retries_and_records_failure():
+    client, adapter = make_client([502, 502, 502])
+    with pytest.raises(WolframError):
+        client.result('2+2')
+    assert adapter.calls == 3
+    assert client.breaker.failures == 1
+
+
+def test_not_understood_is_not_retried_and_counts_as_healthy():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    client, adapter = make_client([501], breaker=breaker)
+
+    with pytest.raises(QueryNotUnderstood):
+        client.result('gibberish')
+    assert adapter.calls == 1
+    assert breaker.state == 'closed'
+
+
+def test_breaker_opens_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client, adapter = make_client([500, 500], retries=0, breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(WolframError):
+            client.result('2+2')
+    assert breaker.state == 'open'
+
+    with pytest.raises(CircuitOpenError):
+        client.result('2+2')
+    assert adapter.calls == 2
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(wolfram_service.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def open_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 31
+    return breaker
+
+
+def test_half_open_trial_success_closes(clock):
+    breaker = open_breaker(clock)
+    client, _ = make_client([200], retries=0, breaker=breaker)
+    assert client.result('2+2') == 'answer 1'
+    assert breaker.state == 'closed'
+
+
+@pytest.mark.parametrize('outcome', [
+    503,
+    requests.ConnectionError('refused'),
+    requests.exceptions.InvalidURL('bad url'),
+    ValueError('unexpected'),
+])
+def test_half_open_trial_failure_reopens(clock, outcome):
+    breaker = open_breaker(clock)
+    client, _ = make_client([outcome], retries=0, breaker=breaker)
+
+    with pytest.raises(WolframError):
+        client.result('2+2')
+    assert breaker.state == 'open'
+    assert breaker.opened_at == clock[0]
+
+    # only one trial is let through per reset window
+    with pytest.raises(CircuitOpenError):
+        client.result('2+2')
+
+
+def test_query_wolfram_falls_back(monkeypatch):
+    client, _ = make_client([500, 500, 500])
+    monkeypatch.setattr(wolfram_service, 'get_wolfram_client', lambda: client)
+    assert wolfram_service.query_wolfram('2+2') == FALLBACK_ANSWER
@@ -0,0 +1,63 @@
+# server/visit_query.py
+from datetime import datetime
+
+from supabase import Client
+
+from pagination import keyset_page
+
+# Visits with the patient's name embedded by PostgREST (visits.patient_id -> patients.id),
+# so a list and its names come back in one round-trip
+VISIT_LIST_COLUMNS = 'id, patient_id, doctor_id, visitdate, patients(name)'
+
+
+def _today(query, now):
+    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
+    end_of_day = now.replace(hour=23, minute=59, second=59, microsecond=999999).isoformat()
+    return query.gte('visitdate', start_of_day).lte('visitdate', end_of_day)
+
+
+def _future(query, now):
+    return query.gt('visitdate', now.isoformat())
+
+
+def _past(query, now):
+    # completed visits, whatever their date; the status filter does the work
+    return query
+
+
+# window -> (date filter, default status, newest first)
+WINDOWS = {
+    'today':  (_today, False, False),
+    'future': (_future, False, False),
+    'past':   (_past, True, True),
+}
+
+
+def compact(row):
+    patient = row.get('patients') or {}
+    return {
+        'id':           row['id'],
+        'patient_id':   row['patient_id'],
+        'patient_name': patient.get('name') or 'Unknown',
+        'doctor_id':    row['doctor_id'],
+        'visitdate':    row['visitdate'],
+    }
+
+
+def list_visits(supabase: Client, window, doctor_id=None, status=None, limit=50, cursor=None):
+    """
+    One keyset page of visits in `window` ('today', 'future' or 'past'),
+    optionally for one doctor. `status` defaults to the window's (open
+    for today/future, completed for past). Returns (compact rows, next
+    cursor) from a single PostgREST request.
+    """
+    date_filter, default_status, desc = WINDOWS[window]
+
+    query = supabase.table('visits').select(VISIT_LIST_COLUMNS)
+    query = date_filter(query, datetime.utcnow())
+    if doctor_id is not None:
+        query = query.eq('doctor_id', doctor_id)
+    query = query.eq('status', default_status if status is None else status)
+
+    rows, next_cursor = keyset_page(query, 'visitdate', 'id', limit, cursor, desc=desc)
+    return [compact(r) for r in rows], next_cursor
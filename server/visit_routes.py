@@ -1,179 +1,40 @@
 from flask import Blueprint, request, jsonify
-from supabase import create_client, Client
-import os
 from dotenv import load_dotenv
-from datetime import datetime
+from invalidation import patient_changed
+from clients import supabase
+from pagination import CursorError, page_args, with_next_cursor
+from visit_query import list_visits
 
 load_dotenv()
 
 visit_routes = Blueprint('visit_routes', __name__)
 
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+def _visit_list(window, doctor_id):
+    if not doctor_id:
+        return jsonify({'error': 'Unauthorized: Doctor ID missing'}), 401
+
+    try:
+        limit, cursor = page_args(request.args)
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    visits, next_cursor = list_visits(supabase, window, doctor_id=doctor_id, limit=limit, cursor=cursor)
+    return with_next_cursor(jsonify(visits), next_cursor), 200
 
 @visit_routes.route('/future-visits', methods=['GET'])
 def get_future_visits():
-    # Step 1: get current logged-in doctor ID
-    current_doctor_id = request.headers.get('Authorization-Id')  # adjust this to match how you do it for patients!
-
-    if not current_doctor_id:
-        return jsonify({'error': 'Unauthorized: Doctor ID missing'}), 401
-
-    # Step 2: get today's date
-    today = datetime.utcnow().isoformat()
-
-    # Step 3: find only this doctor's future visits
-    resp = (
-        supabase
-        .table('visits')
-        .select('id, patient_id, doctor_id, visitdate')
-        .gt('visitdate', today)
-        .eq('doctor_id', current_doctor_id)
-        .eq('status', False)
-        .order('visitdate')
-        .execute()
-    )
-
-    future_visits = resp.data or []
-    if not future_visits:
-        return jsonify([]), 200
-
-    # 4) Batch-fetch patient names
-    patient_ids = list({v['patient_id'] for v in future_visits})
-    patients_resp = (
-        supabase
-        .table('patients')
-        .select('id, name')
-        .in_('id', patient_ids)
-        .execute()
-    )
-    patients = patients_resp.data or []
-
-    # 5) Build lookup map
-    name_map = {p['id']: p['name'] for p in patients}
-
-    # 6) Enrich each visit record
-    enriched = [
-        {
-            'id':     v['id'],
-            'patient_id':   v['patient_id'],
-            'patient_name': name_map.get(v['patient_id'], 'Unknown'),
-            'doctor_id':    v['doctor_id'],
-            'visitdate':   v['visitdate']
-        }
-        for v in future_visits
-    ]
-
-    return jsonify(enriched), 200
+    # open visits after now, soonest first
+    return _visit_list('future', request.headers.get('Authorization-Id'))
 
 @visit_routes.route('/today-visits', methods=['GET'])
 def get_today_visits():
-    current_doctor_id = request.headers.get('Authorization-Id')
-
-    if not current_doctor_id:
-        return jsonify({'error': 'Unauthorized: Doctor ID missing'}), 401
-
-
-    now = datetime.utcnow()
-    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
-    end_of_day = now.replace(hour=23, minute=59, second=59, microsecond=999999).isoformat()
-
-    # todays aap
-    resp = (
-        supabase
-        .table('visits')
-        .select('id, patient_id, doctor_id, visitdate')
-        .gte('visitdate', start_of_day)
-        .lte('visitdate', end_of_day)
-        .eq('doctor_id', current_doctor_id)
-        .eq('status', False)
-        .order('visitdate')
-        .execute()
-    )
-
-    today_visits = resp.data or []
-    if not today_visits:
-        return jsonify([]), 200
-
-    # 3. Batch-fetch patient names
-    patient_ids = list({v['patient_id'] for v in today_visits})
-    patients_resp = (
-        supabase
-        .table('patients')
-        .select('id, name')
-        .in_('id', patient_ids)
-        .execute()
-    )
-    patients = patients_resp.data or []
-
-    # 4. Build a lookup map: { patient_id: patient_name }
-    name_map = {p['id']: p['name'] for p in patients}
-
-    # 5. Merge names into visit records
-    enriched = []
-    for v in today_visits:
-        enriched.append({
-            'id':    v['id'],
-            'patient_id':  v['patient_id'],
-            'patient_name': name_map.get(v['patient_id'], 'Unknown'),
-            'doctor_id':   v['doctor_id'],
-            'visitdate':  v['visitdate']
-        })
-
-    return jsonify(enriched), 200
+    # open visits today, in schedule order
+    return _visit_list('today', request.headers.get('Authorization-Id'))
 
 @visit_routes.route('/past-visits', methods=['GET'])
 def get_past_visits():
-    # Step 1: get current logged-in doctor ID
-    current_doctor_id = request.headers.get('Authorization')  # adjust this to match how you do it for patients!
-
-    if not current_doctor_id:
-        return jsonify({'error': 'Unauthorized: Doctor ID missing'}), 401
-
-    # Step 3: find only this doctor's future visits
-    resp = (
-        supabase
-        .table('visits')
-        .select('id, patient_id, doctor_id, visitdate')
-        .eq('doctor_id', current_doctor_id)
-        .eq('status', True)
-        .order('visitdate')
-        .execute()
-    )
-
-    past_visits = resp.data or []
-    if not past_visits:
-        return jsonify([]), 200
-
-    # 4) Batch-fetch patient names
-    patient_ids = list({v['patient_id'] for v in past_visits})
-    patients_resp = (
-        supabase
-        .table('patients')
-        .select('id, name')
-        .in_('id', patient_ids)
-        .execute()
-    )
-    patients = patients_resp.data or []
-
-    # 5) Build lookup map
-    name_map = {p['id']: p['name'] for p in patients}
-
-    # 6) Enrich each visit record
-    enriched = [
-        {
-            'id':     v['id'],
-            'patient_id':   v['patient_id'],
-            'patient_name': name_map.get(v['patient_id'], 'Unknown'),
-            'doctor_id':    v['doctor_id'],
-            'visitdate':   v['visitdate']
-        }
-        for v in past_visits
-    ]
-
-    return jsonify(enriched), 200
+    # completed visits, most recent first
+    return _visit_list('past', request.headers.get('Authorization'))
 
 
 @visit_routes.route('/update-visit/<visit_id>', methods=['PATCH'])
@@ -202,7 +63,9 @@ def update_visit(visit_id):
         if not update_data:
             return jsonify({"error": "No valid fields to update"}), 400
 
-        supabase.table('visits').update(update_data).eq('id', visit_id).execute()
+        resp = supabase.table('visits').update(update_data).eq('id', visit_id).execute()
+        for row in resp.data or []:
+            patient_changed(row.get('patient_id'), 'visits')
 
         return jsonify({"message": "Visit updated successfully"}), 200
 
@@ -0,0 +1,95 @@
+# server/visit_timeline.py
+from supabase import Client
+from vitals_series import VitalsSeries
+
+# Union of the visit columns needed by the dashboard, profile and summary views
+TIMELINE_COLUMNS = (
+    'visitdate, content, bloodpressure, oxygenlevel, sugarlevel, '
+    'weight, height, doctorrecommendation'
+)
+
+HEALTH_SUMMARY_FIELDS = (
+    'bloodpressure', 'oxygenlevel', 'sugarlevel',
+    'weight', 'height', 'doctorrecommendation', 'visitdate'
+)
+
+TREND_FIELDS = {
+    'blood_pressure': 'bloodpressure',
+    'oxygen_level':   'oxygenlevel',
+    'sugar_level':    'sugarlevel',
+}
+
+
+class VisitTimeline:
+    """
+    A patient's visits (oldest→newest) plus every view derived from them,
+    built in a single pass:
+      - latest_summary: the newest visit, projected to HEALTH_SUMMARY_FIELDS
+      - series:         {"blood_pressure": VitalsSeries, ...}
+      - trends:         {"blood_pressure": [{"date", "value"}], ...}
+      - visit_history:  [{"date", "summary"}] for visits with content
+    """
+
+    def __init__(self, visits):
+        self.visits = visits
+        self.series = {key: VitalsSeries() for key in TREND_FIELDS}
+        self.visit_history = []
+
+        for v in visits:
+            date_str = v['visitdate'].split('T')[0]
+
+            for key, column in TREND_FIELDS.items():
+                if v.get(column) is not None:
+                    self.series[key].append(date_str, v[column])
+
+            if v.get('content'):
+                self.visit_history.append({
+                    'date':    date_str,
+                    'summary': v['content']
+                })
+
+    @property
+    def trends(self):
+        return self.trend_points()
+
+    def trend_points(self, max_points=None):
+        """
+        Trend payload, each series downsampled to at most `max_points`.
+        """
+        return {
+            key: series.downsample(max_points).to_points()
+            for key, series in self.series.items()
+        }
+
+    @property
+    def latest_summary(self):
+        if not self.visits:
+            return {}
+        latest = self.visits[-1]
+        return {field: latest.get(field) for field in HEALTH_SUMMARY_FIELDS}
+
+    def recent(self, columns):
+        """
+        Visits newest-first, projected to `columns`.
+        """
+        return [{c: v.get(c) for c in columns} for v in reversed(self.visits)]
+
+
+def fetch_visit_timeline(supabase: Client, patient_id, limit=None) -> VisitTimeline:
+    """
+    Reads a patient's visits once with TIMELINE_COLUMNS. With `limit`, only
+    the newest `limit` visits are fetched.
+    """
+    query = (
+        supabase
+        .table('visits')
+        .select(TIMELINE_COLUMNS)
+        .eq('patient_id', patient_id)
+        .order('visitdate', desc=True)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+
+    visits = query.execute().data or []
+    visits.reverse()
+    return VisitTimeline(visits)
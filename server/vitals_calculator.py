@@ -0,0 +1,133 @@
+# server/vitals_calculator.py
+import math
+import re
+
+_BP = re.compile(r"^\s*(\d{2,3}(?:\.\d+)?)\s*/\s*(\d{2,3}(?:\.\d+)?)")
+_NUMBER = re.compile(r"[-+]?\d+(?:\.\d+)?")
+
+# Plausible adult/child ranges (inclusive); readings outside them are
+# treated as typos or wrong units rather than fed into the formulas
+WEIGHT_KG_RANGE = (1.0, 500.0)
+HEIGHT_CM_RANGE = (30.0, 300.0)
+SYSTOLIC_RANGE = (50.0, 300.0)
+DIASTOLIC_RANGE = (20.0, 200.0)
+
+# WHO adult BMI categories (upper bounds, exclusive)
+BMI_CATEGORIES = (
+    (18.5, "Underweight"),
+    (25.0, "Normal weight"),
+    (30.0, "Overweight"),
+    (math.inf, "Obesity"),
+)
+
+
+def to_float(value, bounds=None):
+    """
+    Parses user/DB input ("72", 72, "72.5 kg") into a positive float, or None.
+    The sign is kept, so "-70" is rejected; with `bounds=(low, high)` values
+    outside that range are rejected too.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        m = _NUMBER.search(str(value))
+        if not m:
+            return None
+        number = float(m.group(0))
+    if not (number > 0 and math.isfinite(number)):
+        return None
+    if bounds is not None and not bounds[0] <= number <= bounds[1]:
+        return None
+    return number
+
+
+def _weight_height(weight_kg, height_cm):
+    return to_float(weight_kg, WEIGHT_KG_RANGE), to_float(height_cm, HEIGHT_CM_RANGE)
+
+
+def bmi(weight_kg, height_cm):
+    weight, height = _weight_height(weight_kg, height_cm)
+    if weight is None or height is None:
+        return None
+    meters = height / 100
+    return round(weight / (meters * meters), 1)
+
+
+def bmi_category(value):
+    if value is None:
+        return None
+    for upper, label in BMI_CATEGORIES:
+        if value < upper:
+            return label
+
+
+def body_surface_area(weight_kg, height_cm):
+    """
+    Mosteller formula, in m².
+    """
+    weight, height = _weight_height(weight_kg, height_cm)
+    if weight is None or height is None:
+        return None
+    return round(math.sqrt(weight * height / 3600), 2)
+
+
+def parse_blood_pressure(value):
+    """
+    "120/80" → (120.0, 80.0); None when the reading cannot be parsed.
+    """
+    if not isinstance(value, str):
+        return None
+    m = _BP.match(value)
+    if not m:
+        return None
+    systolic, diastolic = float(m.group(1)), float(m.group(2))
+    if diastolic >= systolic:
+        return None
+    if not (SYSTOLIC_RANGE[0] <= systolic <= SYSTOLIC_RANGE[1]
+            and DIASTOLIC_RANGE[0] <= diastolic <= DIASTOLIC_RANGE[1]):
+        return None
+    return systolic, diastolic
+
+
+def mean_arterial_pressure(blood_pressure):
+    parsed = parse_blood_pressure(blood_pressure)
+    if parsed is None:
+        return None
+    systolic, diastolic = parsed
+    return round(diastolic + (systolic - diastolic) / 3, 1)
+
+
+def pulse_pressure(blood_pressure):
+    parsed = parse_blood_pressure(blood_pressure)
+    if parsed is None:
+        return None
+    systolic, diastolic = parsed
+    return round(systolic - diastolic, 1)
+
+
+def derive_metrics(visit):
+    """
+    Derived vitals for one visit row (weight, height, bloodpressure columns).
+    Missing or malformed inputs yield None for the affected metrics.
+    """
+    value = bmi(visit.get('weight'), visit.get('height'))
+    return {
+        'bmi':                    value,
+        'bmi_category':           bmi_category(value),
+        'body_surface_area':      body_surface_area(visit.get('weight'), visit.get('height')),
+        'mean_arterial_pressure': mean_arterial_pressure(visit.get('bloodpressure')),
+        'pulse_pressure':         pulse_pressure(visit.get('bloodpressure')),
+    }
+
+
+def annotate_visits(visits):
+    """
+    Batch API: returns the visit rows with a `derived` dict added to each.
+    """
+    return [{**v, 'derived': derive_metrics(v)} for v in visits]
+
+
+def format_bmi(value):
+    return f"BMI {value} kg/m² ({bmi_category(value)})"
@@ -0,0 +1,162 @@
+# server/vitals_series.py
+import math
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def to_number(value):
+    """
+    Numeric reading for a vitals value. Blood pressure strings such as
+    "120/80" map to their systolic component; unparseable values are NaN.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        m = _NUMBER.search(value)
+        if m:
+            return float(m.group(0))
+    return math.nan
+
+
+class VitalsSeries:
+    """
+    One vitals metric stored column-wise: parallel arrays of date ordinals
+    and numeric readings, plus the original values so the JSON payload
+    ({"date": "YYYY-MM-DD", "value": <original>}) is unchanged.
+
+    Points are expected in ascending date order.
+    """
+
+    __slots__ = ("dates", "values", "raw")
+
+    def __init__(self):
+        self.dates = array("l")
+        self.values = array("d")
+        self.raw = []
+
+    @classmethod
+    def from_points(cls, points):
+        series = cls()
+        for p in points:
+            series.append(p["date"], p["value"])
+        return series
+
+    def append(self, date_str, value):
+        self.dates.append(date.fromisoformat(date_str[:10]).toordinal())
+        self.values.append(to_number(value))
+        self.raw.append(value)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _take(self, indices):
+        out = VitalsSeries()
+        for i in indices:
+            out.dates.append(self.dates[i])
+            out.values.append(self.values[i])
+            out.raw.append(self.raw[i])
+        return out
+
+    # ── aggregates ────────────────────────────────────────────────────────
+    def _finite(self):
+        return [v for v in self.values if not math.isnan(v)]
+
+    def min(self):
+        finite = self._finite()
+        return min(finite) if finite else None
+
+    def max(self):
+        finite = self._finite()
+        return max(finite) if finite else None
+
+    def mean(self):
+        finite = self._finite()
+        return math.fsum(finite) / len(finite) if finite else None
+
+    def slope(self):
+        """
+        Least-squares trend in units per day, or None with < 2 readings.
+        """
+        pairs = [(d, v) for d, v in zip(self.dates, self.values) if not math.isnan(v)]
+        n = len(pairs)
+        if n < 2:
+            return None
+        mean_x = math.fsum(d for d, _ in pairs) / n
+        mean_y = math.fsum(v for _, v in pairs) / n
+        var_x = math.fsum((d - mean_x) ** 2 for d, _ in pairs)
+        if var_x == 0:
+            return None
+        cov = math.fsum((d - mean_x) * (v - mean_y) for d, v in pairs)
+        return cov / var_x
+
+    def stats(self):
+        return {
+            "count": len(self),
+            "min":   self.min(),
+            "max":   self.max(),
+            "mean":  self.mean(),
+            "slope": self.slope(),
+        }
+
+    # ── slicing and downsampling ──────────────────────────────────────────
+    def window(self, start=None, end=None):
+        """
+        Points with start <= date <= end (ISO date strings, both optional).
+        """
+        lo = bisect_left(self.dates, date.fromisoformat(start).toordinal()) if start else 0
+        hi = bisect_right(self.dates, date.fromisoformat(end).toordinal()) if end else len(self)
+        return self._take(range(lo, hi))
+
+    def downsample(self, max_points):
+        """
+        Largest-Triangle-Three-Buckets downsampling to at most `max_points`
+        points. The first and last points are always kept.
+        """
+        n = len(self)
+        if not max_points or max_points >= n:
+            return self
+        if max_points < 3:
+            return self._take([0, n - 1][:max_points])
+
+        xs, ys = self.dates, self.values
+        keep = [0]
+        bucket_size = (n - 2) / (max_points - 2)
+        a = 0
+
+        for b in range(max_points - 2):
+            start = int(b * bucket_size) + 1
+            end = int((b + 1) * bucket_size) + 1
+
+            # average of the next bucket (or the last point)
+            next_start = end
+            next_end = min(int((b + 2) * bucket_size) + 1, n)
+            if next_start >= next_end:
+                next_start, next_end = n - 1, n
+            nxt = [(xs[i], ys[i]) for i in range(next_start, next_end) if not math.isnan(ys[i])]
+            if nxt:
+                avg_x = math.fsum(x for x, _ in nxt) / len(nxt)
+                avg_y = math.fsum(y for _, y in nxt) / len(nxt)
+            else:
+                avg_x, avg_y = xs[n - 1], ys[n - 1]
+
+            ax, ay = xs[a], ys[a]
+            best, best_area = start, -1.0
+            for i in range(start, end):
+                area = abs((ax - avg_x) * (ys[i] - ay) - (ax - xs[i]) * (avg_y - ay))
+                if area > best_area:  # NaN areas never win
+                    best, best_area = i, area
+            keep.append(best)
+            a = best
+
+        keep.append(n - 1)
+        return self._take(keep)
+
+    def to_points(self):
+        return [
+            {"date": date.fromordinal(d).isoformat(), "value": v}
+            for d, v in zip(self.dates, self.raw)
+        ]
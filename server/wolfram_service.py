@@ -1,16 +1,183 @@
 import os
+import random
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from metrics import LatencyHistogram
+
+WOLFRAM_RESULT_URL = 'https://api.wolframalpha.com/v1/result'
+FALLBACK_ANSWER = "Sorry, Wolfram couldn't compute that."
+
+
+class WolframError(Exception):
+    pass
+
+
+class CircuitOpenError(WolframError):
+    pass
+
+
+class QueryNotUnderstood(WolframError):
+    """Wolfram answered, but could not make sense of the query."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures and
+    fails fast until `reset_timeout` seconds have passed; then a single
+    trial request is let through (half-open) to decide whether to close.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half-open'
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures}
+
+
+class WolframClient:
+    """
+    Wolfram|Alpha Short Answers client on a pooled keep-alive session,
+    with connect/read timeouts, bounded retries with jittered exponential
+    backoff and a circuit breaker. `base_url` can point at a local stub.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        app_id=None,
+        base_url=WOLFRAM_RESULT_URL,
+        connect_timeout=3.05,
+        read_timeout=10.0,
+        retries=2,
+        backoff=0.25,
+        pool_size=10,
+        breaker=None,
+        session=None
+    ):
+        self.app_id = app_id if app_id is not None else os.getenv('WOLFRAM_API_KEY')
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.latency = LatencyHistogram('wolfram.latency')
+        metrics.register('wolfram.circuit', self.breaker.snapshot)
+
+    def result(self, question):
+        """
+        Returns Wolfram's short answer text. Raises CircuitOpenError when
+        failing fast, WolframError when the query cannot be answered or
+        upstream keeps failing.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("Wolfram circuit is open")
+
+        # every way out records an outcome, or a half-open breaker never closes again
+        try:
+            text = self._fetch(question)
+        except QueryNotUnderstood:
+            # upstream is healthy, the query is not
+            self.breaker.record_success()
+            raise
+        except WolframError:
+            self.breaker.record_failure()
+            raise
+        except BaseException as e:
+            self.breaker.record_failure()
+            if isinstance(e, Exception):
+                raise WolframError(f"Wolfram request failed: {e}") from e
+            raise
+        self.breaker.record_success()
+        return text
+
+    def _fetch(self, question):
+        params = {'i': question, 'appid': self.app_id}
+        last_error = None
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                # full jitter keeps retries from synchronizing across workers
+                time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            try:
+                with self.latency.time():
+                    resp = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                last_error = e
+                continue
+
+            if resp.status_code == 200:
+                return resp.text
+            if resp.status_code in self.RETRY_STATUSES:
+                last_error = WolframError(f"Wolfram returned {resp.status_code}")
+                continue
+
+            # e.g. 501 "did not understand"
+            raise QueryNotUnderstood(f"Wolfram returned {resp.status_code}: {resp.text[:200]}")
+
+        raise WolframError(f"Wolfram request failed: {last_error}")
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_wolfram_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = WolframClient(
+                connect_timeout=float(os.getenv('WOLFRAM_CONNECT_TIMEOUT', 3.05)),
+                read_timeout=float(os.getenv('WOLFRAM_READ_TIMEOUT', 10)),
+                retries=int(os.getenv('WOLFRAM_RETRIES', 2))
+            )
+        return _client
+
 
 def query_wolfram(question):
-    app_id = os.getenv('WOLFRAM_API_KEY')
-    endpoint = 'https://api.wolframalpha.com/v1/result'
-    params = {
-        'i': question,
-        'appid': app_id
-    }
-    response = requests.get(endpoint, params=params)
-
-    if response.status_code == 200:
-        return response.text
-    else:
-        return "Sorry, Wolfram couldn't compute that."
+    try:
+        return get_wolfram_client().result(question)
+    except WolframError as e:
+        print('Wolfram query failed:', e)
+        return FALLBACK_ANSWER